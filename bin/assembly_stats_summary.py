@@ -1,10 +1,13 @@
 #!/usr/bin/env python3
 import os
+import sys
 import glob
 import logging
 
 import pandas as pd
 
+from result_cache import ResultCache
+
 logging.basicConfig(level = logging.DEBUG, format = '%(levelname)s : %(message)s')
 
 logging.debug("Function for summarizing assembly output")
@@ -31,16 +34,21 @@ def summarize_assembly_file(file):
 
     return df
 
-logging.info("Obtaining all assembly ratio output files to begin processing.")
-files = glob.glob("data/*_Assembly_ratio_*")
+def main():
+    logging.info("Obtaining all assembly ratio output files to begin processing.")
+    files = glob.glob("data/*_Assembly_ratio_*")
+
+    logging.info("Summarizing output files.")
+    cache = ResultCache()
+    dfs = [cache(summarize_assembly_file, file) for file in files]
+    cache.close()
 
-logging.info("Summarizing output files.")
-dfs = map(summarize_assembly_file, files)
-dfs = list(dfs)
+    if len(dfs) > 1:
+        dfs_concat = pd.concat(dfs)
+        dfs_concat.to_csv(f'assembly_stats_results_summary.tsv',sep='\t', index=False, header=True, na_rep='NaN')
+    else:
+        dfs = dfs[0]
+        dfs.to_csv(f'assembly_stats_results_summary.tsv',sep='\t', index=False, header=True, na_rep='NaN')
 
-if len(dfs) > 1:
-    dfs_concat = pd.concat(dfs)
-    dfs_concat.to_csv(f'assembly_stats_results_summary.tsv',sep='\t', index=False, header=True, na_rep='NaN')
-else:
-    dfs = dfs[0]
-    dfs.to_csv(f'assembly_stats_results_summary.tsv',sep='\t', index=False, header=True, na_rep='NaN')
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,13 @@
 #!/usr/bin/env python3
 import os
+import sys
 import glob
 import logging
 
 import pandas as pd
 
+from result_cache import ResultCache
+
 logging.basicConfig(level = logging.INFO, format = '%(levelname)s : %(message)s')
 
 logging.debug("Function for summarizing bbduk output")
@@ -30,14 +33,20 @@ def summarize_bbduk(file):
 
     return data
 
-logging.info("Obtaining all bbduk output files.")
-files = glob.glob("data*/*.trim.txt")
+def main():
+    logging.info("Obtaining all bbduk output files.")
+    files = glob.glob("data*/*.trim.txt")
+
+    logging.info("Summarizing bbduk output files.")
+    cache = ResultCache()
+    results = [cache(summarize_bbduk, file) for file in files]
+    cache.close()
 
-logging.info("Summarizing bbduk output files.")
-results = map(summarize_bbduk,files)
+    logging.debug("Convert results to data frame and write to tsv")
+    df = pd.DataFrame(results,columns=['Sample','Total Reads','Reads Removed'])
 
-logging.debug("Convert results to data frame and write to tsv")
-df = pd.DataFrame(results,columns=['Sample','Total Reads','Reads Removed'])
+    logging.debug("Writing results to tsv file")
+    df.to_csv(f'bbduk_results.tsv',sep='\t', index=False, header=True, na_rep='NaN')
 
-logging.debug("Writing results to tsv file")
-df.to_csv(f'bbduk_results.tsv',sep='\t', index=False, header=True, na_rep='NaN')
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import argparse
+import logging
+import filecmp
+import tempfile
+import subprocess
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s : %(message)s')
+
+def parse_args(args=None):
+    Description='Benchmark create_report.py on a synthetic cohort: peak RSS and run time of the default mode and of --chunksize, and a check that every mode writes a byte-identical CSV.'
+    Epilog='Use with benchmark_create_report.py [--samples <N>] [--missing <FRACTION>] [--chunksize <N> ...]'
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument('--samples',
+        type=int,
+        default=5000,
+        help='Number of samples in the cohort (default: 5000).')
+    parser.add_argument('--missing',
+        type=float,
+        default=0.05,
+        help='Fraction of samples missing from the QUAST, coverage and assembly ratio summaries, as for samples that failed assembly (default: 0.05).')
+    parser.add_argument('--chunksize',
+        type=int,
+        nargs='+',
+        default=[700],
+        help='Chunk sizes to run --chunksize with (default: 700).')
+    parser.add_argument('--seed',
+        type=int,
+        default=1,
+        help='Seed of the synthetic values (default: 1).')
+    parser.add_argument('--workdir',
+        help='Keep the cohort and the reports in this directory (default: a temporary directory that is removed).')
+    return parser.parse_args(args)
+
+logging.debug("Function for writing the summary files of a synthetic cohort, in shuffled sample order like the collected summaries of a run")
+def write_cohort(outdir, samples, missing, seed):
+    rng = np.random.default_rng(seed)
+    names = np.array([f'S{i:06d}' for i in range(samples)])
+
+    def write(name, df, drop=False):
+        df = df.sample(frac=1, random_state=seed)
+        if drop:
+            df = df[rng.random(len(df)) >= missing]
+        df.to_csv(os.path.join(outdir, name), sep='\t', index=False)
+
+    reads = rng.integers(200000, 4000000, samples)
+    removed = rng.integers(0, 5000, samples)
+    write('bbduk_results.tsv', pd.DataFrame({'Sample': names, 'Total Reads': reads,
+                                             'Reads Removed': [f'{r} ({r / t * 100:.2f}%)' for r, t in zip(removed, reads)]}))
+    write('quality_stats.tsv', pd.DataFrame({'Sample': names, 'Median Read Quality': rng.integers(28, 38, samples),
+                                             'Average Read Quality': rng.integers(26, 37, samples),
+                                             'Pass Average Read Quality': 'TRUE', 'Quality Stats Comments': ''}))
+    write('quast_results.tsv', pd.DataFrame({'Sample': names, 'Assembly Length (bp)': rng.integers(1900000, 2300000, samples),
+                                             'Contigs': rng.integers(15, 400, samples), 'N50': rng.integers(20000, 300000, samples),
+                                             'Pass Contigs': 'True', 'QUAST Summary Comments': ''}), drop=True)
+    write('assembly_stats_results_summary.tsv', pd.DataFrame({'Sample': names, 'Actual length': rng.integers(1900000, 2300000, samples),
+                                                              'Ratio of Actual:Expected Genome Length': rng.integers(90, 110, samples) / 100,
+                                                              'z-score': np.round(rng.normal(0, 1, samples), 3)}), drop=True)
+    write('coverage_stats.tsv', pd.DataFrame({'Sample': names, 'Median Coverage': rng.integers(10, 300, samples),
+                                              'Average Coverage': rng.integers(10, 300, samples),
+                                              'Pass Coverage': 'TRUE', 'Coverage Stats Comments': ''}), drop=True)
+    write('percent_strep_results.tsv', pd.DataFrame({'Sample': names, 'Percent Strep': np.round(rng.uniform(60, 100, samples), 2),
+                                                     'Percent SPN': np.round(rng.uniform(40, 95, samples), 2),
+                                                     'SecondGenus': rng.choice(['', 'Staphylococcus', 'Escherichia'], samples),
+                                                     'Percent SecondGenus': np.round(rng.uniform(0, 2, samples), 2),
+                                                     'Pass Kraken': 'True', 'Percent Strep Comments': ''}))
+    write('seroba_results.tsv', pd.DataFrame({'Sample': names, 'Serotype': rng.choice(['3', '6A', '11A', '19A', '19F', '23F', '35B'], samples),
+                                              'SeroBA Comments': 'SeroBA did not detect contamination'}))
+
+    with open(os.path.join(outdir, 'versions.yml'), 'w') as outFile:
+        outFile.write('"KRAKEN_SAMPLE":\n    kraken: 1.0\n    kraken DB: minikraken_20171013_4GB\n')
+
+    return sorted(os.path.join(outdir, file) for file in os.listdir(outdir))
+
+logging.debug("Function for running create_report.py in its own directory, the peak RSS of the process comes from wait4")
+def run_report(result_files, outdir, extra_args):
+    os.makedirs(outdir, exist_ok=True)
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'create_report.py'),
+               '--result_files', *result_files, '--workflowVersion', 'benchmark', '--workflowRunName', 'benchmark',
+               '--empty_ntc_list', '[Empty]', *extra_args]
+    start = time.monotonic()
+    process = subprocess.Popen(command, cwd=outdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    seconds = time.monotonic() - start
+    if os.waitstatus_to_exitcode(status) != 0:
+        logging.critical(f"create_report.py {' '.join(extra_args)} failed")
+        sys.exit(1)
+    return os.path.join(outdir, 'benchmark_spntypeid_report.csv'), seconds, usage.ru_maxrss / 1024
+
+def benchmark(workdir, args):
+    cohort = os.path.join(workdir, 'cohort')
+    os.makedirs(cohort, exist_ok=True)
+    result_files = write_cohort(cohort, args.samples, args.missing, args.seed)
+
+    runs = [('default', [])] + [(f'--chunksize {chunksize}', ['--chunksize', str(chunksize)]) for chunksize in args.chunksize]
+    results = [(mode, *run_report(result_files, os.path.join(workdir, mode.strip('-').replace(' ', '_')), extra_args)) for mode, extra_args in runs]
+
+    print(f"{args.samples} samples, {args.missing * 100:g}% missing from the QUAST, coverage and assembly ratio summaries")
+    print("Mode\tSeconds\tPeak RSS (MB)\tCSV")
+    identical = True
+    for mode, report, seconds, rss in results:
+        same = filecmp.cmp(report, results[0][1], shallow=False)
+        identical = identical and same
+        print(f"{mode}\t{seconds:.1f}\t{rss:.0f}\t{'reference' if report == results[0][1] else 'identical' if same else 'DIFFERENT'}")
+    return identical
+
+def main(args=None):
+    args = parse_args(args)
+
+    if args.workdir:
+        identical = benchmark(args.workdir, args)
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            identical = benchmark(workdir, args)
+
+    if not identical:
+        logging.critical("The chunked reports are not byte-identical to the default report")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,9 +6,12 @@
 
 import argparse
 import csv
+import gzip
 import logging
 import sys
+import zlib
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 logger = logging.getLogger()
@@ -131,6 +134,130 @@ class RowChecker:
             row[self._sample_col] = f"{sample}_T{seen[sample]}"
 
 
+def first_record_status(path):
+    """
+    Check whether a gzipped FASTQ file contains at least one record.
+
+    Only the start of the file is decompressed, so this takes the same time for any
+    file size.
+
+    Args:
+        path (pathlib.Path): The gzipped FASTQ file.
+
+    Returns:
+        str: "pass" if the first line of the file is a FASTQ header, "corrupt" if the
+        start of the file is not a readable gzip stream, else "empty".
+
+    """
+    try:
+        with gzip.open(path, "rb") as handle:
+            return "pass" if handle.readline().startswith(b"@") else "empty"
+    except (EOFError, OSError, zlib.error):
+        return "corrupt"
+
+
+def count_reads(path, chunk_size=1 << 20):
+    """
+    Count the reads of a gzipped FASTQ file by counting newlines in the decompressed stream.
+
+    Args:
+        path (pathlib.Path): The gzipped FASTQ file.
+        chunk_size (int): The number of decompressed bytes read at a time.
+
+    Returns:
+        tuple: The number of reads and whether the gzip stream is truncated or corrupt.
+
+    """
+    lines = 0
+    last = b"\n"
+    try:
+        with gzip.open(path, "rb") as handle:
+            for chunk in iter(lambda: handle.read(chunk_size), b""):
+                lines += chunk.count(b"\n")
+                last = chunk[-1:]
+    except (EOFError, OSError, zlib.error):
+        return lines // 4, True
+    if last != b"\n":
+        lines += 1
+    return lines // 4, False
+
+
+class ReadChecker:
+    """
+    Define a service that checks the FASTQ files of validated rows and records the result.
+
+    Attributes:
+        mode (str): Either "first", which only checks that each file has a first record
+            and starts as a readable gzip stream, or "count", which also counts the reads of each file and detects truncated
+            gzip streams and R1/R2 read count mismatches.
+
+    """
+
+    STATUS_COLUMNS = ("reads_1", "reads_2", "read_status")
+
+    def __init__(self, mode="first", threads=1, first_col="fastq_1", second_col="fastq_2"):
+        """
+        Initialize the read checker.
+
+        Args:
+            mode (str): The check to run, "first" or "count" (default "first").
+            threads (int): The number of files checked at the same time (default 1).
+            first_col (str): The name of the column that contains the first FASTQ file
+                path (default "fastq_1").
+            second_col (str): The name of the column that contains the second FASTQ file
+                path (default "fastq_2").
+
+        """
+        self.mode = mode
+        self._threads = threads
+        self._first_col = first_col
+        self._second_col = second_col
+
+    def check(self, rows, staged=None):
+        """
+        Check the FASTQ files of all rows and add the read count and status columns.
+
+        Args:
+            rows (list): The validated rows.
+            staged (list): Optional local copies of the FASTQ files, in the order the
+                non-empty FASTQ entries appear in the rows. Used when the samplesheet
+                paths are remote or relative to another directory.
+
+        """
+        paths = [row[col] for row in rows for col in (self._first_col, self._second_col) if row[col]]
+        files = [Path(path) for path in staged] if staged else [Path(path) for path in paths]
+        if len(files) != len(paths):
+            raise AssertionError("The number of staged FASTQ files does not match the samplesheet.")
+        task = count_reads if self.mode == "count" else first_record_status
+        # Decompression in zlib releases the GIL, so threads check files in parallel.
+        with ThreadPoolExecutor(max_workers=self._threads) as pool:
+            results = dict(zip(paths, pool.map(task, files)))
+        for row in rows:
+            self._set_status(row, [results[row[col]] for col in (self._first_col, self._second_col) if row[col]])
+
+    def _set_status(self, row, results):
+        """Record read counts and one status of pass, empty, corrupt, truncated or mismatched."""
+        if self.mode == "count":
+            counts = [reads for reads, _ in results]
+            row["reads_1"], row["reads_2"] = (counts + ["NA"])[:2]
+            if any(truncated for _, truncated in results):
+                row["read_status"] = "truncated"
+            elif min(counts) == 0:
+                row["read_status"] = "empty"
+            elif len(set(counts)) > 1:
+                row["read_status"] = "mismatched"
+            else:
+                row["read_status"] = "pass"
+        else:
+            row["reads_1"], row["reads_2"] = "NA", "NA"
+            if "corrupt" in results:
+                row["read_status"] = "corrupt"
+            elif "empty" in results:
+                row["read_status"] = "empty"
+            else:
+                row["read_status"] = "pass"
+
+
 def read_head(handle, num_lines=10):
     """Read the specified number of lines from the current position in the file."""
     lines = []
@@ -163,7 +290,7 @@ def sniff_format(handle):
     return dialect
 
 
-def check_samplesheet(file_in, file_out):
+def check_samplesheet(file_in, file_out, read_check="none", threads=1, staged=None):
     """
     Check that the tabular samplesheet has the structure expected by nf-core pipelines.
 
@@ -175,6 +302,12 @@ def check_samplesheet(file_in, file_out):
             CSV, TSV, or any other format automatically recognized by ``csv.Sniffer``.
         file_out (pathlib.Path): Where the validated and transformed samplesheet should
             be created; always in CSV format.
+        read_check (str): Either "none", "first" or "count". If not "none", the FASTQ
+            files are checked with :class:`ReadChecker` and the read counts and status
+            are added as extra columns.
+        threads (int): The number of FASTQ files checked at the same time.
+        staged (list): Optional local copies of the FASTQ files, see
+            :meth:`ReadChecker.check`.
 
     Example:
         This function checks that the samplesheet follows the following structure,
@@ -209,6 +342,13 @@ def check_samplesheet(file_in, file_out):
         #checker.validate_unique_samples()
     header = list(reader.fieldnames)
     header.insert(1, "single_end")
+    if read_check != "none":
+        try:
+            ReadChecker(read_check, threads).check(checker.modified, staged)
+        except AssertionError as error:
+            logger.critical(str(error))
+            sys.exit(1)
+        header.extend(ReadChecker.STATUS_COLUMNS)
     # See https://docs.python.org/3.9/library/csv.html#id3 to read up on `newline=""`.
     with file_out.open(mode="w", newline="") as out_handle:
         writer = csv.DictWriter(out_handle, header, delimiter=",")
@@ -235,6 +375,26 @@ def parse_args(argv=None):
         type=Path,
         help="Transformed output samplesheet in CSV format.",
     )
+    parser.add_argument(
+        "--read-check",
+        help="Check the FASTQ files: 'first' only checks that each file has a first record and is a readable gzip file, "
+        "'count' also counts reads and detects truncated files and R1/R2 mismatches (default none).",
+        choices=("none", "first", "count"),
+        default="none",
+    )
+    parser.add_argument(
+        "--threads",
+        help="The number of FASTQ files checked at the same time (default 1).",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--staged",
+        metavar="FASTQ",
+        nargs="+",
+        type=Path,
+        help="Local copies of the FASTQ files, in samplesheet order.",
+    )
     parser.add_argument(
         "-l",
         "--log-level",
@@ -253,7 +413,7 @@ def main(argv=None):
         logger.error(f"The given input file {args.file_in} was not found!")
         sys.exit(2)
     args.file_out.parent.mkdir(parents=True, exist_ok=True)
-    check_samplesheet(args.file_in, args.file_out)
+    check_samplesheet(args.file_in, args.file_out, args.read_check, args.threads, args.staged)
 
 
 if __name__ == "__main__":
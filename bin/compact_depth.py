@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s : %(message)s')
+
+def parse_args(args=None):
+    Description='Convert samtools depth files into a compact binary depth array and contig index.'
+    Epilog='Use with compact_depth.py <depth files>'
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument('files',
+        nargs='+',
+        help='Samtools depth -a files (.depth.tsv or .depth.tsv.gz).')
+    parser.add_argument('--chunksize',
+        type=int,
+        default=1000000,
+        help='Number of depth rows to read at a time (default: 1000000).')
+    return parser.parse_args(args)
+
+logging.debug("Function for reading a samtools depth file into one depth array and a contig index")
+def read_depth(file, chunksize=1000000):
+
+    depths = []
+    contigs = []
+    lengths = []
+
+    logging.debug("Read contig and depth columns in chunks, positions are implicit with samtools depth -a")
+    try:
+        reader = pd.read_csv(file, sep='\t', header=None, usecols=[0, 2], dtype={0: str, 2: np.uint32},
+                             chunksize=chunksize, compression='infer')
+        for chunk in reader:
+            depths.append(chunk[2].to_numpy())
+
+            logging.debug("Run length encode the contig column to get contig boundaries")
+            names = chunk[0].to_numpy()
+            starts = np.flatnonzero(np.r_[True, names[1:] != names[:-1]])
+            counts = np.diff(np.r_[starts, len(names)])
+            for name, count in zip(names[starts], counts):
+                if contigs and contigs[-1] == name:
+                    lengths[-1] += int(count)
+                else:
+                    contigs.append(name)
+                    lengths.append(int(count))
+    except pd.errors.EmptyDataError:
+        logging.debug("Empty depth file, returning empty depth array")
+
+    depth = np.concatenate(depths) if depths else np.zeros(0, dtype=np.uint32)
+    offsets = np.r_[0, np.cumsum(lengths)[:-1]].astype(np.int64) if lengths else np.zeros(0, dtype=np.int64)
+    index = pd.DataFrame({'Contig': contigs, 'Offset': offsets, 'Length': lengths})
+
+    return depth, index
+
+logging.debug("Function for writing a depth array with the smallest unsigned dtype that holds it")
+def write_compact_depth(sid, depth, index):
+
+    dtype = np.uint16 if len(depth) == 0 or depth.max() <= np.iinfo(np.uint16).max else np.uint32
+    np.save(f'{sid}.depth.npy', depth.astype(dtype, copy=False))
+    index.to_csv(f'{sid}.depth.index.tsv', sep='\t', index=False, header=True)
+
+logging.debug("Function for memory-mapping a compact depth array and its contig index")
+def load_compact_depth(npy_file):
+
+    index_file = npy_file.replace('.depth.npy', '.depth.index.tsv')
+    depth = np.load(npy_file, mmap_mode='r')
+    index = pd.read_csv(index_file, sep='\t', dtype={'Contig': str, 'Offset': np.int64, 'Length': np.int64})
+
+    return depth, index
+
+def main(args=None):
+    args = parse_args(args)
+
+    for file in args.files:
+        sid = os.path.basename(file).split('.')[0]
+
+        logging.info(f"Converting {file} to compact depth")
+        depth, index = read_depth(file, args.chunksize)
+
+        write_compact_depth(sid, depth, index)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import glob
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+from functools import partial
+
+from compact_depth import load_compact_depth
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s : %(message)s')
+
+logging.debug("Missing values are written as NA, like the other summary files")
+CONTIG_COLUMNS = ['Sample','Contig','Length','Mean Coverage','Median Coverage','Coverage CV']
+UNIFORMITY_COLUMNS = ['Sample','Windows','Window Mean Coverage','Window Coverage CV','Zero Depth Windows (%)']
+
+def parse_args(args=None):
+    Description='A script to summarize per-contig and windowed coverage from compact depth files.'
+    Epilog='Use with contig_coverage.py --window <WINDOW> --step <STEP>'
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument('--window',
+        type=int,
+        default=1000,
+        help='Sliding window size in bp (default: 1000).')
+    parser.add_argument('--step',
+        type=int,
+        default=None,
+        help='Sliding window step in bp (default: window size).')
+    return parser.parse_args(args)
+
+logging.debug("Function for getting sliding window mean depth with a cumulative sum")
+def window_means(depth, window, step):
+
+    if len(depth) < window:
+        return np.zeros(0)
+
+    cumulative = np.r_[0, np.cumsum(depth, dtype=np.int64)]
+    starts = np.arange(0, len(depth) - window + 1, step)
+
+    return (cumulative[starts + window] - cumulative[starts]) / window
+
+def coefficient_of_variation(values):
+
+    mean = values.mean() if len(values) else 0
+    return round(float(values.std() / mean), 4) if mean > 0 else 'NA'
+
+logging.debug("Function for summarizing per-contig and windowed coverage of one sample")
+def summarize_contigs(file, window, step):
+
+    logging.debug("Get sample id from file name and memory-map depth")
+    sid = os.path.basename(file).split('.')[0]
+    depth, index = load_compact_depth(file)
+
+    contig_rows = []
+    windows = []
+    for contig, offset, length in index.itertuples(index=False):
+        contig_depth = depth[offset:offset + length]
+        contig_rows.append([sid,
+                            contig,
+                            length,
+                            round(float(contig_depth.mean()), 2) if length else 0,
+                            int(np.median(contig_depth)) if length else 0,
+                            coefficient_of_variation(contig_depth)])
+
+        logging.debug("Windows do not span contig boundaries")
+        windows.append(window_means(contig_depth, window, step))
+
+    contig_df = pd.DataFrame(contig_rows, columns=CONTIG_COLUMNS)
+
+    logging.debug("Summarize coverage uniformity across all windows of the sample")
+    windows = np.concatenate(windows) if windows else np.zeros(0)
+    zero_windows = round(float((windows == 0).mean() * 100), 2) if len(windows) else 'NA'
+    uniformity_df = pd.DataFrame([[sid,
+                                   len(windows),
+                                   round(float(windows.mean()), 2) if len(windows) else 'NA',
+                                   coefficient_of_variation(windows),
+                                   zero_windows]],
+                                 columns=UNIFORMITY_COLUMNS)
+
+    return contig_df, uniformity_df
+
+def main(args=None):
+    args = parse_args(args)
+    step = args.step or args.window
+
+    logging.info("Obtaining all compact depth files")
+    files = glob.glob("data*/*.depth.npy")
+
+    summarize_contigs_partial = partial(summarize_contigs, window=args.window, step=step)
+
+    logging.info("Summarizing per-contig and windowed coverage")
+    results = list(map(summarize_contigs_partial, files))
+
+    logging.debug("Concatenate results and write data frames to file, with only the header when there are no depth files")
+    if results:
+        contig_df = pd.concat([result[0] for result in results])
+        uniformity_df = pd.concat([result[1] for result in results])
+    else:
+        logging.warning("No compact depth files found")
+        contig_df = pd.DataFrame(columns=CONTIG_COLUMNS)
+        uniformity_df = pd.DataFrame(columns=UNIFORMITY_COLUMNS)
+    contig_df.to_csv('contig_coverage.tsv', sep='\t', index=False, header=True, na_rep='NA')
+    uniformity_df.to_csv('coverage_uniformity.tsv', sep='\t', index=False, header=True, na_rep='NA')
+
+if __name__ == "__main__":
+    sys.exit(main())
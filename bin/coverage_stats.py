@@ -6,59 +6,168 @@ import glob
 import argparse
 import logging
 
-from functools import partial
-from numpy import median
-from numpy import average
+import numpy as np
+import pandas as pd
+
+from result_cache import ResultCache
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s : %(message)s')
 
 def parse_args(args=None):
-    Description='A script go through kraken and seroba results and summarize them.'
-    Epilog='Use with typing_summary.py <args.minpctstrep> <args.minpctspn> <args.maxpctother>'
+    Description='A script go through samtools depth files and summarize them.'
+    Epilog='Use with coverage_stats.py <args.mincoverage> [depth files or - for stdin]'
     parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
     parser.add_argument('mincoverage',
         help='This is supplied by the nextflow config and can be changed via the usual methods i.e. command line.')
+    parser.add_argument('files',
+        nargs='*',
+        help='Samtools depth files (.depth.tsv or .depth.tsv.gz), compact depth arrays (.depth.npy) or - to read from stdin. Defaults to data*/*.depth.{tsv,tsv.gz,npy}.')
+    parser.add_argument('--contigs',
+        action='store_true',
+        help='Estimate coverage from Shovill/SPAdes contig headers (len= and cov=) instead of samtools depth. Defaults to data*/*.contigs.fa.')
+    parser.add_argument('--sample',
+        help='Sample id to use when reading depth from stdin.')
+    parser.add_argument('--chunksize',
+        type=int,
+        default=1000000,
+        help='Number of depth rows to read at a time (default: 1000000).')
     return parser.parse_args(args)
 
-logging.debug("Function for summarizing samtools depth files")
-def summarize_depth(file, mincoverage):
+logging.debug("Function for building a depth histogram from a samtools depth file in one pass")
+def depth_histogram(handle, chunksize=1000000):
+
+    logging.debug("Histogram index is the depth, value is the number of positions at that depth")
+    hist = np.zeros(1, dtype=np.int64)
+
+    logging.debug("Read only the depth column in chunks so memory is bounded by the maximum depth")
+    try:
+        reader = pd.read_csv(handle, sep='\t', header=None, usecols=[2], dtype={2: np.int64},
+                             chunksize=chunksize, compression='infer')
+        for chunk in reader:
+            counts = np.bincount(chunk[2].to_numpy())
+            if len(counts) > len(hist):
+                counts[:len(hist)] += hist
+                hist = counts
+            else:
+                hist[:len(counts)] += counts
+    except pd.errors.EmptyDataError:
+        logging.debug("Empty depth file, returning empty histogram")
+
+    return hist
+
+logging.debug("Function for getting the exact median and mean of sorted values from their counts, same as numpy median/average on the values")
+def histogram_median_average(counts, values=None):
+    """Values default to the histogram bins 0, 1, 2, ... Median and mean are truncated to int."""
+    n = int(counts.sum())
+    if n == 0:
+        return 0, 0
+    if values is None:
+        values = np.arange(len(counts), dtype=np.int64)
+
+    logging.debug("Median matches numpy.median: average of the two middle values for an even number of values")
+    cumulative = np.cumsum(counts)
+    lower = values[np.searchsorted(cumulative, (n - 1) // 2, side='right')]
+    upper = values[np.searchsorted(cumulative, n // 2, side='right')]
+    return int((lower + upper) / 2), int(np.dot(counts, values) / n)
+
+logging.debug("Function for getting exact median, mean and breadth of coverage from a depth histogram")
+def histogram_stats(hist, mincoverage):
 
-    logging.debug("get sample id from file name and set up data list")
-    sid = os.path.basename(file).split('.')[0]
-    data = []
+    positions = int(hist.sum())
+    if positions == 0:
+        return 0, 0, 0.0, 0.0, 0.0
 
-    logging.debug("Open samtools depth file and get depth")
-    with open(file,'r') as inFile:
+    med, avg = histogram_median_average(hist)
+
+    logging.debug("Breadth of coverage is the fraction of positions at or above a depth")
+    def breadth(depth):
+        return round(float(hist[depth:].sum()) / positions * 100, 2)
+
+    return med, avg, breadth(1), breadth(10), breadth(int(mincoverage))
+
+logging.debug("Function for getting length weighted coverage stats from Shovill contig headers")
+def contig_header_stats(file, mincoverage):
+
+    lengths = []
+    coverages = []
+
+    logging.debug("Get len= and cov= from each contig header, e.g. >contig00001 len=1234 cov=56.7 ...")
+    with open(file, 'r') as inFile:
         for line in inFile:
-            data.append(int(line.strip().split()[2]))
+            if line.startswith('>'):
+                tags = dict(field.split('=', 1) for field in line[1:].split() if '=' in field)
+                lengths.append(int(tags['len']))
+                coverages.append(float(tags['cov']))
+
+    lengths = np.array(lengths, dtype=np.int64)
+    coverages = np.array(coverages, dtype=np.float64)
+    positions = int(lengths.sum())
+    if positions == 0:
+        return 0, 0, 0.0, 0.0, 0.0
+
+    logging.debug("Median and mean are taken over bases, every base of a contig has the contig coverage")
+    order = np.argsort(coverages, kind='stable')
+    med, avg = histogram_median_average(lengths[order], coverages[order])
 
-    logging.debug("Get median and average depth")
-    med = int(median(data))
-    avg = int(average(data))
+    def breadth(depth):
+        return round(float(lengths[coverages >= depth].sum()) / positions * 100, 2)
 
-    logging.debug("Return sample id, median and average depth, and check for coverage fail")
+    return med, avg, breadth(1), breadth(10), breadth(int(mincoverage))
+
+logging.debug("Function for summarizing samtools depth files")
+def summarize_depth(file, mincoverage, stdin_sample=None, chunksize=1000000):
+
+    logging.debug("Get sample id from file name")
+    sid = stdin_sample if file == '-' else os.path.basename(file).split('.')[0]
+
+    logging.debug("Get median and average depth from contig headers, or from a depth histogram")
+    if file.endswith('.contigs.fa'):
+        med, avg, breadth_1x, breadth_10x, breadth_min = contig_header_stats(file, mincoverage)
+    else:
+        if file == '-':
+            hist = depth_histogram(sys.stdin.buffer, chunksize)
+        elif file.endswith('.npy'):
+            hist = np.bincount(np.load(file, mmap_mode='r')).astype(np.int64)
+        else:
+            hist = depth_histogram(file, chunksize)
+        med, avg, breadth_1x, breadth_10x, breadth_min = histogram_stats(hist, mincoverage)
+
+    logging.debug("Return sample id, median and average depth, breadth of coverage, and check for coverage fail")
+    breadth = f"{breadth_1x}\t{breadth_10x}\t{breadth_min}"
     if avg >= int(mincoverage):
-        result = f"{sid}\t{med}\t{avg}\tTRUE\t\n"
+        result = f"{sid}\t{med}\t{avg}\tTRUE\t\t{breadth}\n"
     if avg < int(mincoverage):
-        result = f"{sid}\t{med}\t{avg}\tFALSE\tAverage coverage < {mincoverage}X\n"
+        result = f"{sid}\t{med}\t{avg}\tFALSE\tAverage coverage < {mincoverage}X\t{breadth}\n"
     return result
 
+def write_results(results):
+
+    logging.info("Write results to file")
+    with open('coverage_stats.tsv', 'w') as outFile:
+        outFile.write("Sample\tMedian Coverage\tAverage Coverage\tPass Coverage\tCoverage Stats Comments\tBreadth 1X (%)\tBreadth 10X (%)\tBreadth Min Coverage (%)\n")
+        for result in results:
+            outFile.write(result)
+
 def main(args=None):
     args = parse_args(args)
 
-    logging.info("Get all samtools depth files")
-    files = glob.glob("data*/*.depth.tsv")
+    logging.info("Get all samtools depth or contig files")
+    files = args.files
+    if not files and args.contigs:
+        files = glob.glob("data*/*.contigs.fa")
+    elif not files:
+        files = glob.glob("data*/*.depth.tsv") + glob.glob("data*/*.depth.tsv.gz") + glob.glob("data*/*.depth.npy")
 
-    summarize_depth_partial = partial(summarize_depth, mincoverage=args.mincoverage)
+    if '-' in files and not args.sample:
+        logging.critical("A sample id (--sample) is required when reading depth from stdin")
+        sys.exit(1)
 
     logging.info("Summarize samtools depth files")
-    results = map(summarize_depth_partial, files)
+    cache = ResultCache()
+    results = [cache(summarize_depth, file, args.mincoverage, args.sample, args.chunksize) for file in files]
+    cache.close()
 
-    logging.info("Write results to file")
-    with open('coverage_stats.tsv', 'w') as outFile:
-        outFile.write("Sample\tMedian Coverage\tAverage Coverage\tPass Coverage\tCoverage Stats Comments\n")
-        for result in results:
-            outFile.write(result)
+    write_results(results)
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(main())
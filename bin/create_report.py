@@ -1,28 +1,49 @@
 #!/usr/bin/env python3
 
+import os
 import re
-import csv
 import sys
+import heapq
 import argparse
-import glob
 import logging
+import tempfile
+import subprocess
 
+import numpy as np
 import pandas as pd
 
-from functools import reduce
+from concurrent.futures import ThreadPoolExecutor
+
+from kraken_report import load_report
 
 logging.basicConfig(level = logging.INFO, format = '%(levelname)s : %(message)s')
 
-def create_dataframe(result_files):
+logging.debug("Columns added to the end of the report only when their summary file is part of the results")
+OPTIONAL_COLUMNS = ['Sketch Comparison Flags', 'QC Gate Comments', 'Reused From']
 
-    logging.debug("Get all tsv files and read them in as data frames")
+logging.debug("Columns read from the summary files, everything else in them is never loaded")
+RESULT_COLUMNS = ['Total Reads', 'Reads Removed', 'Median Read Quality', 'Average Read Quality', 'Contigs', 'N50',
+                  'Assembly Length (bp)', 'Ratio of Actual:Expected Genome Length', 'z-score', 'Median Coverage',
+                  'Average Coverage', 'Percent Strep', 'Percent SPN', 'SecondGenus', 'Percent SecondGenus', 'Serotype'] + OPTIONAL_COLUMNS
+
+logging.debug("Function for reading the report columns of one summary file indexed on Sample")
+def read_result_file(file, columns=None):
+    df = pd.read_csv(file, header=0, delimiter='\t', index_col='Sample', dtype={'Sample': str},
+                     usecols=['Sample'] + columns if columns is not None else lambda column: column == 'Sample' or column in RESULT_COLUMNS)
+
+    duplicated = df.index[df.index.duplicated()].unique().tolist()
+    if duplicated:
+        raise ValueError(f"Duplicate samples in {file}: {', '.join(duplicated)}")
 
-    do_not_merge_list = ["kraken.txt", "yml"]
+    return df
+
+def split_result_files(result_files):
+
+    do_not_merge_list = ["kraken.txt", "yml", "prior_rows.csv"]
     kraken_ntc_files = []
     kraken_version = []
-
-    logging.debug("Setting up df for all result files")
-    dfs = []
+    merge_files = []
+    prior_files = []
 
     logging.debug(f"Initial result files: {result_files}")
     logging.debug("Remove files that should not be merged and set them up as ad")
@@ -35,25 +56,191 @@ def create_dataframe(result_files):
         elif any(ending.lower() in file.lower() for ending in do_not_merge_list) and file.endswith("yml"):
             kraken_version = file
 
+        elif file.endswith("prior_rows.csv"):
+            prior_files.append(file)
+
         else:
             logging.debug(f"File to be merged: {file}")
-            df = pd.read_csv(file, header=0, delimiter='\t')
-            dfs.append(df)
+            merge_files.append(file)
+
+    return merge_files, kraken_ntc_files, kraken_version, prior_files
+
+logging.debug("Function for the report columns to read from each file, a column found in more than one file is taken from the first file")
+def result_columns(merge_files):
+    seen = set()
+    columns = []
+    for file in merge_files:
+        header = pd.read_csv(file, delimiter='\t', nrows=0).columns
+        keep = [column for column in header if column in RESULT_COLUMNS and column not in seen]
+        repeated = [column for column in header if column in RESULT_COLUMNS and column in seen]
+        if repeated:
+            logging.warning(f"Columns {', '.join(repeated)} in {file} found in an earlier result file, keeping the first")
+        seen.update(keep)
+        columns.append(keep)
+    return columns
 
-    logging.debug("Merge data frames based on sample")
-    merged_df = reduce(lambda  left,right: pd.merge(left,right,on=['Sample'],how='outer'), dfs)
+def create_dataframe(result_files):
+
+    logging.debug("Get all tsv files and read them in as data frames")
+    merge_files, kraken_ntc_files, kraken_version, _ = split_result_files(result_files)
+    dfs = [read_result_file(file, columns) for file, columns in zip(merge_files, result_columns(merge_files))]
 
-    logging.debug("Convert sample names to string")
-    merged_df['Sample'] = merged_df['Sample'].astype(str)
+    logging.debug("Join all data frames on the Sample index in one step")
+    merged_df = pd.concat(dfs, axis=1, join='outer', sort=True)
+    merged_df.index.name = 'Sample'
+    merged_df = merged_df.reset_index()
 
     return merged_df, kraken_ntc_files, kraken_version
 
+logging.debug("Function for checking that a file is sorted by Sample, reading only the Sample column in chunks")
+def sorted_by_sample(file, chunksize):
+    last = None
+    for chunk in pd.read_csv(file, delimiter='\t', usecols=['Sample'], dtype=str, chunksize=chunksize):
+        samples = chunk['Sample']
+        if not samples.is_monotonic_increasing or (last is not None and len(samples) and samples.iloc[0] < last):
+            return False
+        last = samples.iloc[-1] if len(samples) else last
+    return True
+
+logging.debug("Function for sorting a file by Sample on disk with sort, C locale byte order is the same order as python strings")
+def sort_by_sample(file, outdir):
+    sorted_file = os.path.join(outdir, os.path.basename(file))
+    env = dict(os.environ, LC_ALL='C')
+    with open(file, 'r') as inFile, open(sorted_file, 'w') as outFile:
+        outFile.write(inFile.readline())
+    with open(sorted_file, 'a') as outFile:
+        body = subprocess.Popen(['tail', '-n', '+2', file], stdout=subprocess.PIPE)
+        subprocess.run(['sort', '-t', '\t', '-k1,1', '-s'], stdin=body.stdout, stdout=outFile, env=env, check=True)
+        body.wait()
+    return sorted_file
+
+logging.debug("Function for the dtypes the default mode reads, so every chunk writes its values the same way as the whole file would")
+def whole_file_dtypes(files, columns, chunksize):
+    """
+    Text columns are read as text and columns that are float in any chunk are read as floats. Integer columns of a
+    file that misses samples of the other files get empty values in the join, so they are read as floats too.
+    """
+    kinds = [{} for _ in files]
+    counts = [0] * len(files)
+
+    def samples(i, file, file_columns):
+        for chunk in pd.read_csv(file, header=0, delimiter='\t', dtype={'Sample': str}, usecols=['Sample'] + file_columns, chunksize=chunksize):
+            counts[i] += len(chunk)
+            for column in file_columns:
+                kinds[i].setdefault(column, set()).add(chunk[column].dtype.kind)
+            yield from chunk['Sample']
+
+    logging.debug("Samples in all files, counted from the files merged in Sample order")
+    union = 0
+    last = None
+    for sample in heapq.merge(*[samples(i, file, file_columns) for i, (file, file_columns) in enumerate(zip(files, columns))]):
+        if sample != last:
+            union += 1
+            last = sample
+
+    dtypes = []
+    for i, file_kinds in enumerate(kinds):
+        file_dtypes = {}
+        for column, column_kinds in file_kinds.items():
+            if 'O' in column_kinds:
+                file_dtypes[column] = str
+            elif 'f' in column_kinds or (column_kinds <= {'i', 'u'} and counts[i] < union):
+                file_dtypes[column] = np.float64
+        dtypes.append(file_dtypes)
+    return dtypes
+
+logging.debug("Function for reading a Sample sorted file in chunks, checking the order and duplicates across chunks")
+def read_sorted_chunks(file, columns, chunksize, dtypes=None):
+    last = None
+    for chunk in pd.read_csv(file, header=0, delimiter='\t', index_col='Sample', dtype={'Sample': str, **(dtypes or {})},
+                             usecols=['Sample'] + columns, chunksize=chunksize):
+        if not chunk.index.is_unique or not chunk.index.is_monotonic_increasing or (last is not None and len(chunk) and chunk.index[0] <= last):
+            raise ValueError(f"Duplicate or unsorted samples in {file}")
+        last = chunk.index[-1] if len(chunk) else last
+        yield compact_dtypes(chunk, nullable=True)
+
+logging.debug("Function for merging Sample sorted files chunk by chunk, at most about one chunk per file is in memory")
+def stream_dataframe(merge_files, chunksize, tmpdir):
+    columns = result_columns(merge_files)
+    files = []
+    for file in merge_files:
+        if not sorted_by_sample(file, chunksize):
+            logging.info(f"Sorting {file} by sample")
+            file = sort_by_sample(file, tmpdir)
+        files.append(file)
+    dtypes = whole_file_dtypes(files, columns, chunksize)
+    readers = [read_sorted_chunks(file, file_columns, chunksize, file_dtypes) for file, file_columns, file_dtypes in zip(files, columns, dtypes)]
+
+    buffers = [pd.DataFrame(columns=file_columns, index=pd.Index([], dtype=object, name='Sample')) for file_columns in columns]
+    done = [False] * len(readers)
+    while True:
+        for i, reader in enumerate(readers):
+            while not done[i] and not len(buffers[i]):
+                chunk = next(reader, None)
+                if chunk is None:
+                    done[i] = True
+                else:
+                    buffers[i] = chunk
+
+        if not any(len(buffer) for buffer in buffers):
+            return
+
+        logging.debug("Samples up to the smallest last sample of the files that are still being read are complete")
+        bounds = [buffers[i].index[-1] for i in range(len(readers)) if not done[i]]
+        bound = min(bounds) if bounds else None
+        parts = []
+        for i, buffer in enumerate(buffers):
+            split = len(buffer) if bound is None else buffer.index.searchsorted(bound, side='right')
+            parts.append(buffer.iloc[:split])
+            buffers[i] = buffer.iloc[split:]
+
+        merged_df = pd.concat(parts, axis=1, join='outer', sort=True)
+        merged_df.index.name = 'Sample'
+        yield merged_df.reset_index()
+
+logging.debug("Floats only become float32 when every distinct value is the same number and written the same way")
+def float32_exact(values):
+    return all(np.float32(value) == value and str(np.float32(value)) == str(value) for value in values.dropna().unique())
+
+logging.debug("Function for shrinking column dtypes of a chunk without changing the written values")
+def compact_dtypes(df, nullable=False):
+    for column in df.columns:
+        values = df[column]
+        if pd.api.types.is_integer_dtype(values.dtype):
+            df[column] = pd.to_numeric(values, downcast='integer')
+            if nullable:
+                df[column] = df[column].astype(df[column].dtype.name.capitalize())
+        elif pd.api.types.is_float_dtype(values.dtype):
+            if float32_exact(values):
+                df[column] = values.astype(np.float32)
+        elif (values.dtype == object or pd.api.types.is_string_dtype(values.dtype)) and len(values) > 1 and values.nunique() <= len(values) // 2:
+            df[column] = values.astype('category')
+    return df
+
+logging.debug("Function for giving a report chunk the dtypes of the first chunk, a column only keeps a wider dtype when its values would not be written the same")
+def match_dtypes(df, dtypes):
+    for column, dtype in dtypes.items():
+        values = df[column]
+        if values.dtype == dtype:
+            continue
+        if isinstance(dtype, pd.CategoricalDtype):
+            df[column] = values.astype('category')
+        elif pd.api.types.is_integer_dtype(dtype) and pd.api.types.is_integer_dtype(values.dtype):
+            logging.debug("Only nullable integer dtypes can hold empty values")
+            bounds = np.iinfo(getattr(dtype, 'numpy_dtype', dtype))
+            if (isinstance(dtype, pd.api.extensions.ExtensionDtype) or not values.isna().any()) and \
+                    (values.dropna().empty or (bounds.min <= values.min() and values.max() <= bounds.max)):
+                df[column] = values.astype(dtype)
+        elif dtype == np.float32 and pd.api.types.is_float_dtype(values.dtype) and float32_exact(values):
+            df[column] = values.astype(np.float32)
+    return df
+
 def grab_kraken_version(kraken_version):
     logging.debug("Open Kraken version file to get Kraken version")
 
     with open(kraken_version, 'r') as krakenFile:
         for l in krakenFile.readlines():
-            if "kraken DB:" in l.strip():
+            if re.search(r'kraken2? DB:', l.strip()):
                 krakenDBVersion = l.strip().split(':')[1].strip()
 
     return krakenDBVersion
@@ -68,66 +255,45 @@ def assign_versions(merged_df, krakenDBVersion, WFVersion):
 
     return merged_df
 
-def kraken_ntc_processing_and_empty_check(kraken_ntc_files, empty_ntcs, merged_df):
+logging.debug("Function for the read totals of one NTC report: all reads, SPN reads and the largest read count of the unclassified and root rows")
+def ntc_totals(file):
+    report = load_report(file)
+    counted = report.rows(rank="U") | (np.char.find(report.name, "root") >= 0)
+    spn = report.rows(taxid=1300)
+
+    return {'NTC': os.path.basename(file).split(".kraken.txt")[0],
+            'total_reads': int(report.clade_reads[counted].sum()),
+            'spn_reads': int(report.clade_reads[spn].sum()),
+            'max_reads': int(report.clade_reads[counted].max()) if counted.any() else 0,
+            'max_spn_reads': int(report.clade_reads[spn].max()) if spn.any() else 0}
+
+logging.debug("Function for parsing all NTC reports at the same time into one row of totals per NTC, empty NTCs get zeros")
+def ntc_table(kraken_ntc_files, empty_ntcs, threads=1):
+
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as pool:
+        totals = list(pool.map(ntc_totals, kraken_ntc_files))
+
+    logging.debug("Empty NTCs come in as a groovy list, e.g. [NTC03,NTC04] or [Empty]")
+    empty_NTC_list = [sample.strip() for sample in ''.join(empty_ntcs or []).strip("[]").split(",")]
+    found = {row['NTC'] for row in totals}
+    totals.extend({'NTC': sample, 'total_reads': 0, 'spn_reads': 0, 'max_reads': 0, 'max_spn_reads': 0}
+                  for sample in empty_NTC_list if sample and sample != "Empty" and sample not in found)
+
+    return pd.DataFrame(totals, columns=['NTC', 'total_reads', 'spn_reads', 'max_reads', 'max_spn_reads']).sort_values('NTC', kind='stable')
+
+def kraken_ntc_processing_and_empty_check(kraken_ntc_files, empty_ntcs, merged_df, threads=1):
 
     logging.debug("Get Kraken NTC results")
     if kraken_ntc_files != []:
-        kraken_ntc_results = glob.glob("*kraken.txt")
-
-        logging.debug("Add NTC column and calculate Kraken NTC read totals")
-        ntc_total_reads = []
-        ntc_SPN_reads = []
-        max_ntc_reads = 0
-        max_ntc_spn_reads = 0
-
-        logging.debug("Read in kraken NTC files and get # of total reads and strep pneumo reads")
-        for file in kraken_ntc_results:
-            id = file.split(".kraken.txt")[0]
-            spn_reads = 0
-            total_reads = 0
-
-            with open(file,'r') as csvfile:
-                dialect = csv.Sniffer().sniff(csvfile.read(1024))
-                csvfile.seek(0)
-                reader = csv.reader(csvfile,dialect)
-                for row in reader:
-                    if row[3] == "U":
-                        total_reads += int(row[1])
-                        if int(row[1]) > max_ntc_reads:
-                            max_ntc_reads = int(row[1])
-                    if "root" in row[5]:
-                        total_reads += int(row[1])
-                        if int(row[1]) > max_ntc_reads:
-                            max_ntc_reads = int(row[1])
-                    if row[4] == "1300":
-                        spn_reads += int(row[1])
-                        if int(row[1]) > max_ntc_spn_reads:
-                            max_ntc_spn_reads = int(row[1])
-
-        logging.debug("Checks if any NTCs are empty and adds them to the totals.")
-        string = ''.join(empty_ntcs)
-        filtered = string.strip("[]")
-        empty_NTC_list = filtered.split(",")
-
-        for sample in empty_NTC_list:
-            if sample != "Empty":
-                if sample not in ntc_total_reads:
-                    ntc_total_reads.append(f"{sample}: 0")
-                    total_reads += 0
-                if sample not in ntc_SPN_reads:
-                    ntc_SPN_reads.append(f"{sample}: 0")
-                    spn_reads += 0
+        ntcs = ntc_table(kraken_ntc_files, empty_ntcs, threads)
 
         logging.debug("Assigning max reads for ntcs")
-        merged_df = merged_df.assign(max_ntc_reads=max_ntc_reads)
-        merged_df = merged_df.assign(max_ntc_spn_reads=max_ntc_spn_reads)
-
-        ntc_total_reads.append(f"{id}: {total_reads}")
-        ntc_SPN_reads.append(f"{id}: {spn_reads}")
+        merged_df = merged_df.assign(max_ntc_reads=int(ntcs['max_reads'].max()))
+        merged_df = merged_df.assign(max_ntc_spn_reads=int(ntcs['max_spn_reads'].max()))
 
         logging.debug("Add NTC totals to data frame")
-        merged_df = merged_df.assign(ntc_all_reads=", ".join(ntc_total_reads))
-        merged_df = merged_df.assign(ntc_all_spn_reads=", ".join(ntc_SPN_reads))
+        merged_df = merged_df.assign(ntc_all_reads=", ".join(ntcs['NTC'] + ": " + ntcs['total_reads'].astype(str)))
+        merged_df = merged_df.assign(ntc_all_spn_reads=", ".join(ntcs['NTC'] + ": " + ntcs['spn_reads'].astype(str)))
 
     else:
         logging.debug("If kraken NTC is empty")
@@ -147,6 +313,32 @@ def assign_run_name(merged_df, WFRunName):
 
     return merged_df
 
+logging.debug("Function for adding the reused report rows of resubmitted samples, under this run and with the columns of this report")
+def append_prior_rows(merged_df, prior_files, WFRunName, ntc_columns):
+    merged_df = merged_df.assign(**{'Reused From': ''})
+    prior = pd.concat([pd.read_csv(file, dtype={'Sample': str}) for file in prior_files], ignore_index=True)
+    prior = prior[~prior['Sample'].isin(merged_df['Sample'])].assign(Run=WFRunName).reindex(columns=merged_df.columns)
+
+    logging.debug("NTC columns describe the NTCs of the earlier run, so they are replaced with the NTCs of this run")
+    ntc_df = rename_columns(pd.DataFrame([ntc_columns]))
+    prior = prior.assign(**{column: ntc_df.at[0, column] for column in ntc_df.columns if column in prior.columns})
+
+    logging.debug("Sketch flags name samples of the earlier run, so they are not carried over")
+    if 'Sketch Comparison Flags' in prior.columns:
+        prior['Sketch Comparison Flags'] = ''
+
+    combined = pd.concat([merged_df, prior], ignore_index=True)
+
+    logging.debug("Integer columns stay integers when the reused rows have empty values")
+    for column in merged_df.columns:
+        if pd.api.types.is_integer_dtype(merged_df[column].dtype) and not pd.api.types.is_integer_dtype(combined[column].dtype):
+            try:
+                combined[column] = combined[column].astype('Int64')
+            except (TypeError, ValueError):
+                pass
+
+    return combined
+
 def rename_columns(merged_df):
     logging.debug("Rename columns to nicer names")
     merged_df = merged_df.rename(columns={'Contigs':'Contigs (#)',
@@ -187,14 +379,85 @@ def reorder_columns(merged_df):
                         'Max NTC SPN read',
                         'All NTC reads',
                         'All NTC SPN reads',
-                        'SPNtypeID Version']]
+                        'SPNtypeID Version'] + [column for column in OPTIONAL_COLUMNS if column in merged_df.columns]]
     
     return merged_df
 
-def write_output(WFRunName, merged_df):
-
-    logging.info("Writing results to csv file")
-    merged_df.to_csv(f'{WFRunName}_spntypeid_report.csv', index=False, sep=',', encoding='utf-8')
+def write_output(WFRunName, merged_df, append=False):
+
+    if not append:
+        logging.info("Writing results to csv file")
+    merged_df.to_csv(f'{WFRunName}_spntypeid_report.csv', index=False, sep=',', encoding='utf-8', mode='a' if append else 'w', header=not append)
+
+logging.debug("Function for the arrow type of a report column, so every chunk is written with the same schema")
+def arrow_type(pa, dtype):
+    if isinstance(dtype, pd.CategoricalDtype):
+        return pa.dictionary(pa.int32(), pa.string())
+    if pd.api.types.is_bool_dtype(dtype):
+        return pa.bool_()
+    if pd.api.types.is_integer_dtype(dtype):
+        return pa.int64()
+    if pd.api.types.is_float_dtype(dtype):
+        return pa.float64()
+    return pa.string()
+
+class ReportWriter:
+    """Writes the report as CSV and optionally Parquet, Arrow IPC and newline-delimited JSON, one chunk of rows at a time."""
+
+    def __init__(self, WFRunName, formats=("csv",), metadata=None):
+        self._run = WFRunName
+        self._formats = formats
+        self._metadata = metadata or {}
+        self._written = False
+        self._schema = None
+        self._writers = {}
+
+        if {"parquet", "arrow"} & set(formats):
+            try:
+                import pyarrow
+            except ImportError:
+                raise ImportError("Parquet and Arrow report outputs need pyarrow")
+
+    @property
+    def written(self):
+        return self._written
+
+    def _open(self, merged_df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        logging.debug("The schema comes from the first chunk, with the run metadata attached")
+        self._schema = pa.schema([(column, arrow_type(pa, dtype)) for column, dtype in merged_df.dtypes.items()],
+                                 metadata={key: str(value) for key, value in self._metadata.items()})
+        if "parquet" in self._formats:
+            self._writers["parquet"] = pq.ParquetWriter(f'{self._run}_spntypeid_report.parquet', self._schema, compression='zstd')
+        if "arrow" in self._formats:
+            self._writers["arrow"] = pa.ipc.new_file(f'{self._run}_spntypeid_report.arrow', self._schema)
+
+    def write(self, merged_df):
+        if "csv" in self._formats:
+            write_output(self._run, merged_df, append=self._written)
+
+        if "ndjson" in self._formats:
+            logging.debug("Rows are written and flushed in small blocks, so the file can be read while it is written")
+            with open(f'{self._run}_spntypeid_report.ndjson', 'a' if self._written else 'w') as outFile:
+                for start in range(0, len(merged_df), 1000):
+                    outFile.write(merged_df.iloc[start:start + 1000].to_json(orient='records', lines=True).rstrip('\n') + '\n')
+                    outFile.flush()
+
+        if "parquet" in self._formats or "arrow" in self._formats:
+            import pyarrow as pa
+            if self._schema is None:
+                self._open(merged_df)
+            table = pa.Table.from_pandas(merged_df, preserve_index=False).cast(self._schema)
+            for writer in self._writers.values():
+                writer.write_table(table)
+
+        self._written = True
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
 
 class CompiledResults(argparse.ArgumentParser):
 
@@ -225,23 +488,74 @@ if __name__ == "__main__":
         nargs="*",
         help='This is determined in the spnetypeid script.'
         )
+    parser.add_argument('--threads',
+        type=int,
+        default=1,
+        help='Number of NTC Kraken reports parsed at the same time (default: 1).'
+        )
+    parser.add_argument('--chunksize',
+        type=int,
+        help='Merge the result files this many samples at a time and write the report as it goes, unsorted files are first sorted by sample on disk (default: all samples at once).'
+        )
+    parser.add_argument('--formats',
+        nargs='+',
+        choices=['csv', 'parquet', 'arrow', 'ndjson'],
+        default=['csv'],
+        help='Report formats to write, parquet and arrow need pyarrow (default: csv).'
+        )
 
     logging.debug("Run parser to call arguments downstream")
     args = parser.parse_args()
 
     logging.info("Begin compiling all results for final output file.")
-    merged_df, kraken_ntc_files, kraken_version = create_dataframe(args.result_files)
+    merge_files, kraken_ntc_files, kraken_version, prior_files = split_result_files(args.result_files)
 
     krakenDBVersion = grab_kraken_version(kraken_version)
 
-    merged_df = assign_versions(merged_df, krakenDBVersion, args.workflowVersion)
+    writer = ReportWriter(args.workflowRunName, args.formats, {'spntypeid_run': args.workflowRunName,
+                                                                'spntypeid_version': args.workflowVersion,
+                                                                'kraken_database': krakenDBVersion})
+    logging.debug("NTC columns are the same on every row, so they are worked out once")
+    ntc_columns = kraken_ntc_processing_and_empty_check(kraken_ntc_files, args.empty_ntc_list, pd.DataFrame(index=[0]), args.threads).iloc[0].to_dict()
+
+    if args.chunksize:
+        dtypes = None
+        with tempfile.TemporaryDirectory(dir='.') as tmpdir:
+            for merged_df in stream_dataframe(merge_files, args.chunksize, tmpdir):
+                merged_df = assign_versions(merged_df, krakenDBVersion, args.workflowVersion)
+                merged_df = merged_df.assign(**ntc_columns)
+                merged_df = assign_run_name(merged_df, args.workflowRunName)
+                merged_df = rename_columns(merged_df)
+                if prior_files:
+                    merged_df = merged_df.assign(**{'Reused From': ''})
+                logging.debug("Dtypes are worked out on the first chunk, so every chunk is written with the same dtypes")
+                if dtypes is None:
+                    merged_df = compact_dtypes(reorder_columns(merged_df))
+                    dtypes = merged_df.dtypes
+                else:
+                    merged_df = match_dtypes(reorder_columns(merged_df), dtypes)
+                writer.write(merged_df)
+
+        if writer.written and prior_files:
+            logging.debug("Reused rows of resubmitted samples come after the streamed samples")
+            writer.write(match_dtypes(reorder_columns(append_prior_rows(merged_df.iloc[0:0], prior_files, args.workflowRunName, ntc_columns)), dtypes))
+
+    if not writer.written:
+        merged_df, kraken_ntc_files, kraken_version = create_dataframe(args.result_files)
+
+        merged_df = assign_versions(merged_df, krakenDBVersion, args.workflowVersion)
+
+        merged_df = merged_df.assign(**ntc_columns)
+
+        merged_df = assign_run_name(merged_df, args.workflowRunName)
 
-    merged_df = kraken_ntc_processing_and_empty_check(kraken_ntc_files, args.empty_ntc_list, merged_df)
+        merged_df = rename_columns(merged_df)
 
-    merged_df = assign_run_name(merged_df, args.workflowRunName)
+        if prior_files:
+            merged_df = append_prior_rows(merged_df, prior_files, args.workflowRunName, ntc_columns).sort_values('Sample', kind='stable', ignore_index=True)
 
-    merged_df = rename_columns(merged_df)
+        merged_df = reorder_columns(merged_df)
 
-    merged_df = reorder_columns(merged_df)
+        writer.write(merged_df)
 
-    write_output(args.workflowRunName, merged_df)
+    writer.close()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import gzip
+import argparse
+import logging
+
+import numpy as np
+
+from kmer_sketch import expected_genome_length
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s : %(message)s')
+
+def parse_args(args=None):
+    Description='Downsample paired reads to a maximum expected coverage, keeping R1 and R2 in sync.'
+    Epilog='Use with downsample_reads.py <R1> <R2> --sample <SAMPLE> -d <NCBI_ASSEMBLY_STATS> --max_coverage <MAX_COVERAGE>'
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument('fastqs',
+        nargs=2,
+        help='Gzipped R1 and R2 FASTQ files.')
+    parser.add_argument('--sample',
+        help='Sample id (default: R1 file name up to the first "_").')
+    parser.add_argument('-d', '--path_database',
+        required=True,
+        help='Path to the NCBI assembly stats database, used for the expected genome length.')
+    parser.add_argument('--max_coverage',
+        type=float,
+        required=True,
+        help='Maximum expected coverage to keep.')
+    parser.add_argument('--trim_stats',
+        help='BBDuk log or *.trim.txt file, the Result line gives the number of bases without reading the FASTQ files.')
+    parser.add_argument('--seed',
+        type=int,
+        default=42,
+        help='Random seed, the same seed and input always keep the same read pairs (default: 42).')
+    parser.add_argument('--batch',
+        type=int,
+        default=100000,
+        help='Number of sampling decisions drawn at a time (default: 100000).')
+    return parser.parse_args(args)
+
+logging.debug("Function for getting the number of bases from the BBDuk Result line")
+def bases_from_trim_stats(trim_stats):
+    with open(trim_stats, 'r') as inFile:
+        for line in inFile:
+            if line.startswith('Result:'):
+                return int(re.search(r'(\d+) bases', line).group(1))
+    return None
+
+logging.debug("Function for estimating the number of bases from file size and the first records")
+def bases_from_file_size(fastqs, records=10000):
+
+    total = 0
+    for fastq in fastqs:
+        bases = 0
+        i = -1
+        with gzip.open(fastq, 'rb') as inFile:
+            for i, line in enumerate(inFile):
+                if i % 4 == 1:
+                    bases += len(line.rstrip())
+                if i == records * 4:
+                    break
+            sampled = inFile.fileobj.tell() if inFile.fileobj else 0
+
+        logging.debug("Scale the bases seen by the fraction of the compressed file they came from")
+        size = os.path.getsize(fastq)
+        total += int(bases * size / sampled) if sampled and i == records * 4 else bases
+
+    return total
+
+def downsample(fastqs, prefix, fraction, seed=42, batch=100000):
+
+    rng = np.random.default_rng(seed)
+    keep = rng.random(batch) < fraction
+    kept = 0
+    pairs = 0
+
+    with gzip.open(fastqs[0], 'rb') as in1, gzip.open(fastqs[1], 'rb') as in2, \
+            gzip.open(f'{prefix}_downsampled_1.fastq.gz', 'wb', compresslevel=1) as out1, \
+            gzip.open(f'{prefix}_downsampled_2.fastq.gz', 'wb', compresslevel=1) as out2:
+        record1 = []
+        record2 = []
+        for line1, line2 in zip(in1, in2):
+            record1.append(line1)
+            record2.append(line2)
+            if len(record1) == 4:
+                if keep[pairs % batch]:
+                    out1.write(b''.join(record1))
+                    out2.write(b''.join(record2))
+                    kept += 1
+                pairs += 1
+                if pairs % batch == 0:
+                    keep = rng.random(batch) < fraction
+                record1 = []
+                record2 = []
+
+    return pairs, kept
+
+def main(args=None):
+    args = parse_args(args)
+
+    sid = args.sample or os.path.basename(args.fastqs[0]).split('_')[0]
+
+    logging.info("Counting bases")
+    bases = bases_from_trim_stats(args.trim_stats) if args.trim_stats else None
+    if bases is None:
+        bases = bases_from_file_size(args.fastqs)
+
+    expected_length, _ = expected_genome_length(args.path_database)
+    coverage = bases / expected_length
+    fraction = min(1.0, args.max_coverage / coverage) if coverage > 0 else 1.0
+    logging.info(f"Estimated coverage {coverage:.1f}X, keeping {fraction:.3f} of read pairs")
+
+    if fraction >= 1.0:
+        logging.info("Coverage is below the cap, linking reads without downsampling")
+        os.symlink(os.path.realpath(args.fastqs[0]), f'{sid}_downsampled_1.fastq.gz')
+        os.symlink(os.path.realpath(args.fastqs[1]), f'{sid}_downsampled_2.fastq.gz')
+        pairs = kept = 'NA'
+    else:
+        pairs, kept = downsample(args.fastqs, sid, fraction, args.seed, args.batch)
+
+    with open(f'{sid}.downsample.tsv', 'w') as outFile:
+        outFile.write("Sample\tBases\tEstimated Coverage\tSampling Fraction\tRead Pairs\tRead Pairs Kept\n")
+        outFile.write(f"{sid}\t{bases}\t{round(coverage, 2)}\t{round(fraction, 4)}\t{pairs}\t{kept}\n")
+
+if __name__ == "__main__":
+    sys.exit(main())
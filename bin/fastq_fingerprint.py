@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import csv
+import sqlite3
+import hashlib
+import argparse
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+
+from run_history import SAMPLE_COLUMNS, connect
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s : %(message)s')
+
+logging.debug("Fingerprints of finished samples live next to their report rows in the run history database")
+FINGERPRINT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    fingerprint TEXT NOT NULL,
+    run TEXT NOT NULL,
+    sample TEXT NOT NULL,
+    PRIMARY KEY (fingerprint, run, sample)
+);
+"""
+
+def parse_args(args=None):
+    Description='Fingerprint gzipped FASTQ pairs from sampled blocks of the compressed files and look them up in the run history of finished samples.'
+    Epilog='Use with fastq_fingerprint.py lookup --db <DB> --sample <SAMPLE> <R1> <R2>, fastq_fingerprint.py samplesheet --db <DB> <SAMPLESHEET> or fastq_fingerprint.py add --db <DB> --run <RUN> <FINGERPRINTS_TSV...>'
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--db',
+        required=True,
+        help='Run history SQLite database from run_history.py.')
+    sampling = argparse.ArgumentParser(add_help=False)
+    sampling.add_argument('--blocks',
+        type=int,
+        default=16,
+        help='Number of evenly spaced blocks hashed per file (default: 16).')
+    sampling.add_argument('--block_size',
+        type=int,
+        default=65536,
+        help='Size of each hashed block in bytes (default: 65536).')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    lookup = subparsers.add_parser('lookup', parents=[common, sampling], help='Fingerprint one read pair, write <sample>.fingerprint.tsv and, on a hit, <sample>.prior_row.csv. Prints the prior run/sample or nothing.')
+    lookup.add_argument('fastqs',
+        nargs=2,
+        help='Gzipped R1 and R2 FASTQ files.')
+    lookup.add_argument('--sample',
+        required=True,
+        help='Sample id.')
+
+    samplesheet = subparsers.add_parser('samplesheet', parents=[common, sampling], help='Fingerprint every pair of a samplesheet (sample,fastq_1,fastq_2) and list the samples finished before.')
+    samplesheet.add_argument('samplesheet',
+        help='Samplesheet from fastq_dir_to_samplesheet.py or check_samplesheet.py.')
+    samplesheet.add_argument('-o', '--output',
+        default='fingerprints.tsv',
+        help='Output TSV (default: fingerprints.tsv).')
+    samplesheet.add_argument('--threads',
+        type=int,
+        default=4,
+        help='Number of pairs fingerprinted at the same time (default: 4).')
+
+    add = subparsers.add_parser('add', parents=[common], help='Record the fingerprints of a finished run, after its report was ingested with run_history.py.')
+    add.add_argument('fingerprints',
+        nargs='+',
+        help='fingerprints.tsv files with Sample and Fingerprint columns.')
+    add.add_argument('--run',
+        required=True,
+        help='Run name of the report the samples are in.')
+    return parser.parse_args(args)
+
+logging.debug("Function for hashing the size and evenly spaced blocks of the compressed file, nothing is decompressed")
+def file_fingerprint(file, blocks=16, block_size=65536):
+    size = os.path.getsize(file)
+    digest = hashlib.sha256(str(size).encode())
+    with open(file, 'rb') as inFile:
+        if size <= blocks * block_size:
+            digest.update(inFile.read())
+        else:
+            for i in range(blocks):
+                inFile.seek((size - block_size) * i // (blocks - 1))
+                digest.update(inFile.read(block_size))
+    return digest.hexdigest()
+
+def pair_fingerprint(fastq_1, fastq_2, blocks=16, block_size=65536):
+    return hashlib.sha256(f"{file_fingerprint(fastq_1, blocks, block_size)}:{file_fingerprint(fastq_2, blocks, block_size)}".encode()).hexdigest()
+
+class FingerprintIndex:
+    """
+    Fingerprints of finished samples, only samples with a report row in the run history count as hits.
+    Lookups open the database read-only, so the tasks of a run can share it, and only add creates the schema.
+    """
+
+    def __init__(self, db, readonly=True):
+        if readonly:
+            self._con = sqlite3.connect(f'file:{db}?mode=ro', uri=True) if os.path.exists(db) else None
+        else:
+            self._con = connect(db)
+            self._con.executescript(FINGERPRINT_SCHEMA)
+        self._tables = {name for (name,) in self._con.execute("SELECT name FROM sqlite_master WHERE type = 'table'")} if self._con else set()
+
+    def lookup(self, fingerprint):
+        """(run, sample) of the latest finished sample with this fingerprint, None if there is none."""
+        if not {'fingerprints', 'samples'} <= self._tables:
+            return None
+        return self._con.execute("""SELECT f.run, f.sample FROM fingerprints f
+                                    JOIN samples s ON s.run = f.run AND s.sample = f.sample
+                                    WHERE f.fingerprint = ? ORDER BY s.run_date DESC, f.run DESC LIMIT 1""", (fingerprint,)).fetchone()
+
+    def report_row(self, run, sample):
+        """The report row of a finished sample, with the report column names."""
+        cursor = self._con.execute("""SELECT s.*, r.workflow_version, r.kraken_db FROM samples s
+                                      JOIN runs r ON r.run = s.run WHERE s.run = ? AND s.sample = ?""", (run, sample))
+        row = {column[0]: int(value) if isinstance(value, float) and value.is_integer() else value
+               for column, value in zip(cursor.description, cursor.fetchone())}
+        result = {'Sample': row['sample'], 'Run': row['run']}
+        result.update({header: row[name] for header, (name, _) in SAMPLE_COLUMNS.items() if header != 'Sample'})
+        result['Kraken Database Version'] = row['kraken_db']
+        result['SPNtypeID Version'] = row['workflow_version']
+        return result
+
+    def add(self, rows, run):
+        with self._con:
+            self._con.executemany("INSERT OR IGNORE INTO fingerprints VALUES (?, ?, ?)", [(fingerprint, run, sample) for sample, fingerprint in rows])
+
+    def close(self):
+        if self._con:
+            self._con.close()
+
+def write_fingerprints(rows, file):
+    with open(file, 'w') as outFile:
+        outFile.write("Sample\tFingerprint\tPrior Run\tPrior Sample\n")
+        for sample, fingerprint, prior in rows:
+            outFile.write(f"{sample}\t{fingerprint}\t{prior[0] if prior else ''}\t{prior[1] if prior else ''}\n")
+
+def main(args=None):
+    args = parse_args(args)
+
+    index = FingerprintIndex(args.db, readonly=args.command != 'add')
+    if args.command == 'add':
+        rows = []
+        for file in args.fingerprints:
+            with open(file, 'r', newline='') as inFile:
+                rows.extend((row['Sample'], row['Fingerprint']) for row in csv.DictReader(inFile, delimiter='\t'))
+        index.add(rows, args.run)
+        logging.info(f"Recorded {len(rows)} fingerprints of run {args.run}")
+
+    elif args.command == 'samplesheet':
+        with open(args.samplesheet, 'r', newline='') as inFile:
+            pairs = [(row['sample'], row['fastq_1'], row['fastq_2']) for row in csv.DictReader(inFile) if row.get('fastq_2')]
+        with ThreadPoolExecutor(max_workers=max(1, args.threads)) as pool:
+            fingerprints = list(pool.map(lambda pair: pair_fingerprint(pair[1], pair[2], args.blocks, args.block_size), pairs))
+        rows = [(sample, fingerprint, index.lookup(fingerprint)) for (sample, _, _), fingerprint in zip(pairs, fingerprints)]
+        write_fingerprints(rows, args.output)
+        logging.info(f"{sum(1 for row in rows if row[2])} of {len(rows)} samples were finished before")
+
+    else:
+        fingerprint = pair_fingerprint(args.fastqs[0], args.fastqs[1], args.blocks, args.block_size)
+        prior = index.lookup(fingerprint)
+        write_fingerprints([(args.sample, fingerprint, prior)], f'{args.sample}.fingerprint.tsv')
+
+        if prior:
+            logging.debug("The prior report row is reused under the new sample name")
+            row = index.report_row(*prior)
+            row['Sample'] = args.sample
+            row['Reused From'] = f"{prior[0]}/{prior[1]}"
+            with open(f'{args.sample}.prior_row.csv', 'w', newline='') as outFile:
+                writer = csv.DictWriter(outFile, fieldnames=list(row))
+                writer.writeheader()
+                writer.writerow(row)
+
+        logging.debug("Print the prior run/sample so the workflow can branch on it")
+        print(f"{prior[0]}/{prior[1]}" if prior else "")
+
+    index.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
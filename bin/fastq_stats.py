@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import gzip
+import argparse
+import logging
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s : %(message)s')
+
+logging.debug("Phred+33 encoding, quality scores range from 0 to 93")
+PHRED_OFFSET = 33
+MAX_QUAL = 94
+
+def parse_args(args=None):
+    Description='Scan paired gzipped FASTQ files in one pass and write read quality, length and GC histograms.'
+    Epilog='Use with fastq_stats.py <R1> <R2> --sample <SAMPLE>'
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument('fastqs',
+        nargs='+',
+        help='Gzipped FASTQ files, all reads are added to the same histograms.')
+    parser.add_argument('--sample',
+        help='Sample id (default: first FASTQ file name up to the first "_").')
+    parser.add_argument('--batch',
+        type=int,
+        default=100000,
+        help='Number of reads decoded together (default: 100000).')
+    return parser.parse_args(args)
+
+class FastqHistograms:
+    """Fixed-bin histograms of per-read mean quality, per-position quality, read length and GC."""
+
+    def __init__(self):
+        self.mean_qual = np.zeros(MAX_QUAL, dtype=np.int64)
+        self.position_qual = np.zeros((0, MAX_QUAL), dtype=np.int64)
+        self.length = np.zeros(1, dtype=np.int64)
+        self.gc = np.zeros(101, dtype=np.int64)
+
+    def add_batch(self, seqs, quals):
+        lengths = np.fromiter((len(qual) for qual in quals), dtype=np.int64, count=len(quals))
+        keep = lengths > 0
+        if not keep.all():
+            self.length[0] += int((~keep).sum())
+            seqs = [seq for seq, k in zip(seqs, keep) if k]
+            quals = [qual for qual, k in zip(quals, keep) if k]
+            lengths = lengths[keep]
+        if len(lengths) == 0:
+            return
+
+        offsets = np.r_[0, np.cumsum(lengths)[:-1]]
+        qual = np.frombuffer(b''.join(quals), dtype=np.uint8).astype(np.int64) - PHRED_OFFSET
+        seq = np.frombuffer(b''.join(seqs).upper(), dtype=np.uint8)
+
+        logging.debug("Per-read mean quality truncated to an integer, same as int(meanqual) from bioawk")
+        means = np.add.reduceat(qual, offsets) / lengths
+        self.mean_qual += np.bincount(means.astype(np.int64), minlength=MAX_QUAL)[:MAX_QUAL]
+
+        logging.debug("Per-position quality counts, position is the offset of each base within its read")
+        max_length = int(lengths.max())
+        if max_length > len(self.position_qual):
+            self.position_qual = np.vstack([self.position_qual, np.zeros((max_length - len(self.position_qual), MAX_QUAL), dtype=np.int64)])
+        positions = np.arange(len(qual)) - np.repeat(offsets, lengths)
+        self.position_qual[:max_length] += np.bincount(positions * MAX_QUAL + qual, minlength=max_length * MAX_QUAL).reshape(max_length, MAX_QUAL)
+
+        self.length = _add_counts(self.length, np.bincount(lengths))
+
+        logging.debug("Per-read GC percent in 1% bins")
+        is_gc = (seq == ord('G')) | (seq == ord('C'))
+        gc = np.add.reduceat(is_gc.astype(np.int64), offsets) * 100 // lengths
+        self.gc += np.bincount(gc, minlength=101)
+
+    def save(self, sid):
+        np.savez_compressed(f'{sid}.fastq_stats.npz',
+                            mean_qual=self.mean_qual,
+                            position_qual=self.position_qual,
+                            length=self.length,
+                            gc=self.gc)
+
+def _add_counts(hist, counts):
+    if len(counts) > len(hist):
+        counts[:len(hist)] += hist
+        return counts
+    hist[:len(counts)] += counts
+    return hist
+
+logging.debug("Function for streaming sequence and quality lines of gzipped FASTQ files in batches")
+def scan_fastqs(files, batch=100000):
+
+    histograms = FastqHistograms()
+    for file in files:
+        seqs = []
+        quals = []
+        with gzip.open(file, 'rb') as inFile:
+            for i, line in enumerate(inFile):
+                if i % 4 == 1:
+                    seqs.append(line.rstrip())
+                elif i % 4 == 3:
+                    quals.append(line.rstrip())
+                    if len(quals) >= batch:
+                        histograms.add_batch(seqs, quals)
+                        seqs = []
+                        quals = []
+        if quals:
+            histograms.add_batch(seqs, quals)
+
+    return histograms
+
+def main(args=None):
+    args = parse_args(args)
+
+    sid = args.sample or os.path.basename(args.fastqs[0]).split('_')[0]
+
+    logging.info(f"Scanning reads for {sid}")
+    histograms = scan_fastqs(args.fastqs, args.batch)
+
+    logging.info("Writing read histograms")
+    histograms.save(sid)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import gzip
+import hashlib
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s : %(message)s')
+
+logging.debug("Lookup table from ASCII base to 2-bit code, anything that is not ACGT is 4")
+BASE_CODES = np.full(256, 4, dtype=np.uint64)
+for code, bases in enumerate(['Aa', 'Cc', 'Gg', 'Tt']):
+    for base in bases:
+        BASE_CODES[ord(base)] = code
+
+def parse_args(args=None):
+    Description='Estimate genome size and read duplication from paired reads with k-mer sketches.'
+    Epilog='Use with kmer_sketch.py <R1> <R2> --sample <SAMPLE> -d <NCBI_ASSEMBLY_STATS>'
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument('fastqs',
+        nargs=2,
+        help='Gzipped R1 and R2 FASTQ files.')
+    parser.add_argument('--sample',
+        help='Sample id (default: R1 file name up to the first "_").')
+    parser.add_argument('-d', '--path_database',
+        required=True,
+        help='Path to the NCBI assembly stats database.')
+    parser.add_argument('-k', '--kmer',
+        type=int,
+        default=21,
+        help='K-mer size, at most 31 (default: 21).')
+    parser.add_argument('--min_count',
+        type=int,
+        default=3,
+        help='Minimum k-mer count for a k-mer to be considered solid (default: 3).')
+    parser.add_argument('--scaled',
+        type=int,
+        default=200,
+        help='Keep exact counts for 1 in every SCALED k-mer hashes to estimate solid k-mers (default: 200).')
+    parser.add_argument('--precision',
+        type=int,
+        default=14,
+        help='HyperLogLog precision, uses 2^PRECISION registers (default: 14).')
+    parser.add_argument('--batch',
+        type=int,
+        default=50000,
+        help='Number of read pairs hashed together (default: 50000).')
+    return parser.parse_args(args)
+
+logging.debug("Function for the splitmix64 finalizer, a fast 64-bit integer hash")
+def mix64(values):
+    with np.errstate(over='ignore'):
+        values = values ^ (values >> np.uint64(30))
+        values = values * np.uint64(0xbf58476d1ce4e5b9)
+        values = values ^ (values >> np.uint64(27))
+        values = values * np.uint64(0x94d049bb133111eb)
+        values = values ^ (values >> np.uint64(31))
+    return values
+
+logging.debug("Function for hashing all canonical k-mers of a batch of reads")
+def kmer_hashes(seqs, k):
+
+    logging.debug("Join reads with an N so no k-mer spans two reads")
+    codes = BASE_CODES[np.frombuffer(b'N'.join(seqs), dtype=np.uint8)]
+    n = len(codes) - k + 1
+    if n <= 0:
+        return np.zeros(0, dtype=np.uint64)
+
+    logging.debug("A window is valid if it contains no N")
+    invalid = np.r_[0, np.cumsum(codes == 4)]
+    valid = (invalid[k:] - invalid[:-k]) == 0
+    codes = np.where(codes == 4, np.uint64(0), codes)
+
+    logging.debug("Build forward and reverse complement k-mers with k vectorized shifts")
+    forward = np.zeros(n, dtype=np.uint64)
+    reverse = np.zeros(n, dtype=np.uint64)
+    for j in range(k):
+        window = codes[j:j + n]
+        forward = (forward << np.uint64(2)) | window
+        reverse = reverse | ((np.uint64(3) - window) << np.uint64(2 * j))
+
+    return mix64(np.minimum(forward, reverse)[valid])
+
+class HyperLogLog:
+    """HyperLogLog cardinality sketch over 64-bit hashes."""
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, hashes):
+        if len(hashes) == 0:
+            return
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        remainder = (hashes << np.uint64(self.precision)) | np.uint64(1 << (self.precision - 1))
+        rank = (64 - np.floor(np.log2(remainder.astype(np.float64)))).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def cardinality(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(2.0 ** -self.registers.astype(np.float64))
+        zeros = int((self.registers == 0).sum())
+        if estimate <= 2.5 * m and zeros > 0:
+            logging.debug("Use linear counting for small cardinalities")
+            estimate = m * np.log(m / zeros)
+        return int(estimate)
+
+class ScaledCounter:
+    """Exact counts for the k-mer hashes below 2^64 / scaled, used to find solid k-mers in bounded memory."""
+
+    def __init__(self, scaled=200):
+        self.scaled = scaled
+        self.threshold = np.uint64((2 ** 64 - 1) // scaled)
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def add(self, hashes):
+        kept, counts = np.unique(hashes[hashes < self.threshold], return_counts=True)
+        merged, inverse = np.unique(np.r_[self.hashes, kept], return_inverse=True)
+        self.counts = np.bincount(inverse, weights=np.r_[self.counts, counts], minlength=len(merged)).astype(np.int64)
+        self.hashes = merged
+
+    def solid_hashes(self, min_count):
+        return self.hashes[self.counts >= min_count]
+
+    def solid(self, min_count):
+        return len(self.solid_hashes(min_count)) * self.scaled
+
+logging.debug("Function for reading sequence lines of R1 and R2 together")
+def read_pairs(r1, r2):
+    with gzip.open(r1, 'rb') as file1, gzip.open(r2, 'rb') as file2:
+        for i, (line1, line2) in enumerate(zip(file1, file2)):
+            if i % 4 == 1:
+                yield line1.rstrip(), line2.rstrip()
+
+logging.debug("Function for sketching a read pair in one streaming pass")
+def sketch_reads(r1, r2, k=21, scaled=200, precision=14, batch=50000):
+
+    hll = HyperLogLog(precision)
+    counter = ScaledCounter(scaled)
+    pairs = 0
+    pair_hashes = []
+    seqs = []
+
+    def flush(seqs):
+        hashes = kmer_hashes(seqs, k)
+        hll.add(hashes)
+        counter.add(hashes)
+
+    logging.debug("Keep exact pair hashes for 1 in 16 pairs, duplicates always share the same hash")
+    for seq1, seq2 in read_pairs(r1, r2):
+        pairs += 1
+        seqs.append(seq1)
+        seqs.append(seq2)
+
+        pair_hash = hashlib.blake2b(seq1 + b'\t' + seq2, digest_size=8).digest()
+        if pair_hash[0] < 16:
+            pair_hashes.append(pair_hash)
+
+        if len(seqs) >= 2 * batch:
+            flush(seqs)
+            seqs = []
+    if seqs:
+        flush(seqs)
+
+    duplication = round((1 - len(set(pair_hashes)) / len(pair_hashes)) * 100, 2) if pair_hashes else 0.0
+
+    return pairs, hll.cardinality(), counter, duplication
+
+logging.debug("Function for getting the expected genome length and stdev (in bp) from the NCBI stats")
+def expected_genome_length(path_database, species='Streptococcus pneumoniae'):
+
+    df = pd.read_csv(path_database, sep='\t')
+    row = df[df['Species'].str.strip().str.capitalize() == species].iloc[0]
+
+    return float(row['Mean']) * 1000000, float(row['StDev']) * 1000000
+
+def main(args=None):
+    args = parse_args(args)
+
+    if not 0 < args.kmer <= 31:
+        logging.critical("K-mer size must be between 1 and 31")
+        sys.exit(1)
+
+    sid = args.sample or os.path.basename(args.fastqs[0]).split('_')[0]
+
+    logging.info(f"Sketching reads for {sid}")
+    pairs, distinct, counter, duplication = sketch_reads(args.fastqs[0], args.fastqs[1], args.kmer, args.scaled, args.precision, args.batch)
+    genome_size = counter.solid(args.min_count)
+
+    logging.info("Comparing estimated genome size to expected length")
+    expected_length, stdev = expected_genome_length(args.path_database)
+    ratio = genome_size / expected_length
+    z_score = abs(genome_size - expected_length) / stdev
+
+    logging.debug("Save the solid k-mer hashes as a FracMinHash sketch for run-level sample comparisons")
+    np.save(f'{sid}.kmer_sketch.npy', counter.solid_hashes(args.min_count))
+
+    with open(f'{sid}.kmer_stats.tsv', 'w') as outFile:
+        outFile.write("Sample\tRead Pairs\tDistinct k-mers\tEstimated Genome Length\tRead Duplication (%)\tEstimated Ratio of Actual:Expected Genome Length\tEstimated z-score\n")
+        outFile.write(f"{sid}\t{pairs}\t{distinct}\t{genome_size}\t{duplication}\t{ratio}\t{z_score}\n")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+import sys
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s : %(message)s')
+
+logging.debug("Rank codes used by kraken-report, every other rank is '-'")
+RANK_CODES = {'species': 'S', 'genus': 'G', 'family': 'F', 'order': 'O', 'class': 'C',
+              'phylum': 'P', 'kingdom': 'K', 'superkingdom': 'D'}
+
+def parse_args(args=None):
+    Description='Split batched Kraken output by sample tag and rebuild a kraken-report for each sample.'
+    Epilog='Use with kraken_batch_report.py <KRAKEN_OUTPUT> --manifest <MANIFEST> --nodes <NODES_DMP> --names <NAMES_DMP>'
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument('kraken_output',
+        help='Per-read Kraken output of the batch, read names start with "<sample index>|".')
+    parser.add_argument('--manifest',
+        required=True,
+        help='Tab separated file with one sample id per line as the first column, the line number (from 0) is the sample index in the read names.')
+    parser.add_argument('--nodes',
+        required=True,
+        help='Taxonomy nodes.dmp (or its taxid, parent and rank columns).')
+    parser.add_argument('--names',
+        required=True,
+        help='Taxonomy names.dmp (or its taxid and scientific name columns).')
+    parser.add_argument('--chunksize',
+        type=int,
+        default=1000000,
+        help='Number of Kraken output lines read at a time (default: 1000000).')
+    return parser.parse_args(args)
+
+logging.debug("Function for reading a .dmp file, or the same columns without the '|' separators")
+def read_dmp(file):
+    df = pd.read_csv(file, sep='\t', header=None, dtype=str, quoting=3, keep_default_na=False)
+    return df.loc[:, ~(df == '|').all()].T.reset_index(drop=True).T
+
+class Taxonomy:
+    """Taxonomy tree as arrays indexed by the nodes.dmp line number."""
+
+    def __init__(self, nodes, names):
+        nodes_df = read_dmp(nodes)
+        self.taxid = nodes_df[0].astype(np.int64).to_numpy()
+        parent_taxid = nodes_df[1].astype(np.int64).to_numpy()
+        self.rank = np.array([RANK_CODES.get(rank, '-') for rank in nodes_df[2]], dtype=str)
+
+        logging.debug("Lookup table from taxid to index, -1 for unknown taxids")
+        self.lookup = np.full(self.taxid.max() + 1, -1, dtype=np.int64)
+        self.lookup[self.taxid] = np.arange(len(self.taxid))
+        self.parent = self.lookup[parent_taxid]
+        self.parent[self.parent == np.arange(len(self.taxid))] = -1
+
+        names_df = read_dmp(names)
+        if names_df.shape[1] > 2:
+            names_df = names_df[names_df[3] == 'scientific name']
+        self.name = np.full(len(self.taxid), '', dtype=object)
+        known = self.lookup[np.minimum(names_df[0].astype(np.int64).to_numpy(), len(self.lookup) - 1)]
+        self.name[known[known >= 0]] = names_df[1].to_numpy()[known >= 0]
+
+        logging.debug("Depth by pointer jumping, one vectorized step per tree level")
+        self.depth = np.zeros(len(self.taxid), dtype=np.int64)
+        current = self.parent.copy()
+        active = current >= 0
+        while active.any():
+            self.depth[active] += 1
+            current[active] = self.parent[current[active]]
+            active = current >= 0
+
+    def index(self, taxids):
+        taxids = np.asarray(taxids, dtype=np.int64)
+        index = np.full(len(taxids), -1, dtype=np.int64)
+        known = (taxids >= 0) & (taxids < len(self.lookup))
+        index[known] = self.lookup[taxids[known]]
+        return index
+
+    def clade_counts(self, nodes, counts):
+        """Add direct counts up the tree, only over the counted nodes and their ancestors."""
+        touched = [nodes]
+        current = nodes
+        while len(current):
+            current = np.unique(self.parent[current])
+            current = current[current >= 0]
+            touched.append(current)
+        touched = np.unique(np.concatenate(touched))
+
+        direct = np.zeros(len(touched), dtype=np.int64)
+        direct[np.searchsorted(touched, nodes)] = counts
+        clade = direct.copy()
+        parent = np.searchsorted(touched, self.parent[touched])
+        parent[self.parent[touched] < 0] = -1
+        depth = self.depth[touched]
+        for level in range(int(depth.max()) if len(depth) else 0, 0, -1):
+            members = np.flatnonzero(depth == level)
+            np.add.at(clade, parent[members], clade[members])
+
+        return touched, direct, clade, parent
+
+    def report(self, classified, unclassified, unknown=0):
+        """Kraken 1 kraken-report lines for the direct read counts of one sample."""
+        total = int(sum(classified.values())) + unclassified + unknown
+        lines = []
+        if total == 0:
+            return lines
+        if unclassified:
+            lines.append(f"{unclassified * 100 / total:6.2f}\t{unclassified}\t{unclassified}\tU\t0\tunclassified\n")
+        if not classified:
+            return lines
+
+        nodes = np.array(list(classified.keys()), dtype=np.int64)
+        order = np.argsort(nodes)
+        touched, direct, clade, parent = self.clade_counts(nodes[order], np.array(list(classified.values()), dtype=np.int64)[order])
+
+        logging.debug("Children in nodes.dmp order, then stable sorted by clade count like kraken-report")
+        children = {}
+        for child in np.argsort(parent, kind='stable').tolist():
+            children.setdefault(int(parent[child]), []).append(child)
+
+        stack = [(root, 0) for root in sorted(children.get(-1, []), key=lambda node: -clade[node])[::-1]]
+        while stack:
+            node, depth = stack.pop()
+            index = touched[node]
+            lines.append(f"{clade[node] * 100 / total:6.2f}\t{clade[node]}\t{direct[node]}\t{self.rank[index]}\t{self.taxid[index]}\t{'  ' * depth}{self.name[index]}\n")
+            for child in sorted(children.get(node, []), key=lambda node: -clade[node])[::-1]:
+                stack.append((child, depth + 1))
+
+        return lines
+
+logging.debug("Function for counting reads per sample and taxid from the batched Kraken output")
+def count_reads(kraken_output, taxonomy, chunksize=1000000):
+
+    logging.debug("Unclassified reads are node -1, reads with a taxid missing from the taxonomy are -2 and only count in the total")
+    counts = []
+    reader = pd.read_csv(kraken_output, sep='\t', header=None, usecols=[0, 1, 2], names=['code', 'read', 'taxid'],
+                         dtype={'code': str, 'read': str, 'taxid': np.int64}, chunksize=chunksize, quoting=3)
+    for chunk in reader:
+        chunk['sample'] = chunk['read'].str.split('|', n=1).str[0].astype(np.int64)
+        chunk['node'] = np.where(chunk['code'] == 'U', -1, taxonomy.index(chunk['taxid'].to_numpy()))
+        chunk.loc[(chunk['code'] != 'U') & (chunk['node'] < 0), 'node'] = -2
+        counts.append(chunk.groupby(['sample', 'node']).size())
+
+    if not counts:
+        return pd.Series(dtype=np.int64)
+    return pd.concat(counts).groupby(level=[0, 1]).sum()
+
+def main(args=None):
+    args = parse_args(args)
+
+    samples = [line.split('\t')[0].strip() for line in open(args.manifest) if line.strip()]
+
+    logging.info("Reading taxonomy")
+    taxonomy = Taxonomy(args.nodes, args.names)
+
+    logging.info(f"Counting reads of {len(samples)} samples")
+    counts = count_reads(args.kraken_output, taxonomy, args.chunksize)
+
+    logging.info("Writing Kraken reports")
+    for index, sample in enumerate(samples):
+        sample_counts = counts.xs(index, level=0) if index in counts.index.get_level_values(0) else pd.Series(dtype=np.int64)
+        unclassified = int(sample_counts.get(-1, 0))
+        unknown = int(sample_counts.get(-2, 0))
+        classified = {int(node): int(count) for node, count in sample_counts.items() if node >= 0}
+        with open(f'{sample}.kraken.txt', 'w') as outFile:
+            outFile.writelines(taxonomy.report(classified, unclassified, unknown))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import glob
+import argparse
+import logging
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s : %(message)s')
+
+logging.debug("Column order of a Kraken report, the name is indented by two spaces per tree level")
+REPORT_COLUMNS = ['percent', 'clade_reads', 'direct_reads', 'rank', 'taxid', 'depth', 'name']
+
+def parse_args(args=None):
+    Description='Parse Kraken reports once into compact columnar .npz files next to each report, or evaluate taxon rules across reports.'
+    Epilog='Use with kraken_report.py <KRAKEN_REPORT...> [--rules <RULES_TSV>]'
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument('reports',
+        nargs='+',
+        help='Kraken 1 or Kraken2 report files (*.kraken.txt).')
+    parser.add_argument('--outdir',
+        help='Write the .npz files to this directory instead of next to each report.')
+    parser.add_argument('--rules',
+        help='Evaluate the taxon rules in this TSV (columns Rule, Query, Taxid, Rank, Min, Max) across all reports and write kraken_rules.tsv.')
+    return parser.parse_args(args)
+
+class KrakenReport:
+    """Columnar Kraken report, one numpy array per report column."""
+
+    def __init__(self, sample, percent, clade_reads, direct_reads, rank, taxid, depth, name):
+        self.sample = sample
+        self.percent = percent
+        self.clade_reads = clade_reads
+        self.direct_reads = direct_reads
+        self.rank = rank
+        self.taxid = taxid
+        self.depth = depth
+        self.name = name
+
+    def __len__(self):
+        return len(self.taxid)
+
+    @classmethod
+    def parse(cls, file):
+        """Parse a Kraken 1 or Kraken2 (with or without minimizer columns) report in one pass."""
+        with open(file, 'r') as inFile:
+            rows = [line.rstrip('\n').split('\t') for line in inFile if line.strip()]
+
+        report_format = detect_format(rows[0]) if rows else 'kraken'
+
+        logging.debug("Kraken2 --report-minimizer-data adds two minimizer columns before the rank")
+        if report_format == 'kraken2_minimizers':
+            rows = [row[:3] + row[5:] for row in rows]
+        columns = list(zip(*rows)) if rows else [()] * 6
+        names = [name.lstrip(' ') for name in columns[5]]
+
+        return cls(report_sample(file),
+                   np.array(columns[0], dtype=np.float64),
+                   np.array(columns[1], dtype=np.int64),
+                   np.array(columns[2], dtype=np.int64),
+                   np.array([rank.strip() for rank in columns[3]], dtype=str),
+                   np.array(columns[4], dtype=np.int64),
+                   np.array([(len(name) - len(stripped)) // 2 for name, stripped in zip(columns[5], names)], dtype=np.int16),
+                   np.array(names, dtype=str))
+
+    @classmethod
+    def load(cls, file):
+        """Load a report saved with save()."""
+        with np.load(file) as store:
+            return cls(str(store['sample']), *[store[column] for column in REPORT_COLUMNS])
+
+    def save(self, file, source=None):
+        """Save the report, with the size and modification time of the source report to check the cache."""
+        stat = os.stat(source) if source else None
+        np.savez(file,
+                 sample=self.sample,
+                 source_size=stat.st_size if stat else -1,
+                 source_mtime=stat.st_mtime_ns if stat else -1,
+                 **{column: getattr(self, column) for column in REPORT_COLUMNS})
+
+    def rows(self, rank=None, taxid=None, name=None):
+        """Boolean mask of the rows matching all given values."""
+        mask = np.ones(len(self), dtype=bool)
+        if rank is not None:
+            mask &= self.rank == rank
+        if taxid is not None:
+            mask &= self.taxid == int(taxid)
+        if name is not None:
+            mask &= self.name == name
+        return mask
+
+    def percent_of(self, taxid):
+        """Clade percent of a taxid, None if the taxid is not in the report."""
+        row = self.row_of(taxid)
+        return float(self.percent[row]) if row is not None else None
+
+    def _build_index(self):
+        """Turn the indentation depth into parent rows and preorder clade ends in one pass."""
+        self._parent = np.full(len(self), -1, dtype=np.int64)
+        self._end = np.arange(1, len(self) + 1, dtype=np.int64)
+        stack = []
+        for row, depth in enumerate(self.depth.tolist()):
+            while stack and self.depth[stack[-1]] >= depth:
+                self._end[stack.pop()] = row
+            if stack:
+                self._parent[row] = stack[-1]
+            stack.append(row)
+        for row in stack:
+            self._end[row] = len(self)
+        self._rows = {}
+        for row, taxid in enumerate(self.taxid.tolist()):
+            self._rows.setdefault(taxid, row)
+
+    @property
+    def parent(self):
+        """Row of the parent of each row, -1 for top level rows."""
+        if not hasattr(self, '_parent'):
+            self._build_index()
+        return self._parent
+
+    @property
+    def end(self):
+        """The clade of row i is rows i to end[i] - 1."""
+        if not hasattr(self, '_end'):
+            self._build_index()
+        return self._end
+
+    def row_of(self, taxid):
+        """Row of a taxid, None if the taxid is not in the report."""
+        if not hasattr(self, '_rows'):
+            self._build_index()
+        return self._rows.get(int(taxid))
+
+    def clade(self, taxid):
+        """Boolean mask of the rows in the clade of a taxid, including the taxid itself."""
+        mask = np.zeros(len(self), dtype=bool)
+        row = self.row_of(taxid)
+        if row is not None:
+            mask[row:self.end[row]] = True
+        return mask
+
+    def lineage(self, taxid):
+        """Names from the top of the tree down to a taxid."""
+        row = self.row_of(taxid)
+        path = []
+        while row is not None and row >= 0:
+            path.append(str(self.name[row]))
+            row = int(self.parent[row])
+        return path[::-1]
+
+    def top(self, rank, n=1, outside=None):
+        """The n rows with the highest percent at a rank, optionally outside the clade of a taxid. Ties keep report order."""
+        mask = self.rows(rank=rank)
+        if outside is not None:
+            mask &= ~self.clade(outside)
+        candidates = np.flatnonzero(mask)
+        return candidates[np.argsort(-self.percent[candidates], kind='stable')[:n]]
+
+logging.debug("Function for telling Kraken 1/Kraken2 and Kraken2 with minimizer columns reports apart from the first row")
+def detect_format(row):
+    if row[:2] == ['name', 'taxonomy_id']:
+        raise ValueError("Bracken abundance files have no taxonomy tree, so clade percents such as Percent Strep can not be worked out from them, "
+                         "use the Kraken report or the Kraken style report of Bracken (bracken -w) instead")
+    if len(row) == 8:
+        return 'kraken2_minimizers'
+    if len(row) == 6:
+        return 'kraken'
+    raise ValueError(f"Unrecognized Kraken report format with {len(row)} columns")
+
+logging.debug("Function for getting the sample id from a report or store file name")
+def report_sample(file):
+    return os.path.basename(file).split('.kraken')[0]
+
+logging.debug("Function for getting the store file of a report, <sample>.kraken.txt -> <sample>.kraken.npz")
+def store_path(file, outdir=None):
+    base = os.path.basename(file)
+    base = base[:-len('.txt')] if base.endswith('.txt') else base
+    return os.path.join(outdir if outdir else os.path.dirname(file), f'{base}.npz')
+
+def _cache_valid(store, file):
+    try:
+        stat = os.stat(file)
+        with np.load(store) as cached:
+            return int(cached['source_size']) == stat.st_size and int(cached['source_mtime']) == stat.st_mtime_ns
+    except (OSError, KeyError, ValueError):
+        return False
+
+logging.debug("Function for loading a report through the store, parsing the text only when there is no valid store file or result cache record")
+def load_report(file, cache=True, result_cache=None):
+
+    if file.endswith('.npz'):
+        return KrakenReport.load(file)
+
+    store = store_path(file)
+    if cache and os.path.exists(store) and _cache_valid(store, file):
+        return KrakenReport.load(store)
+
+    report = result_cache(KrakenReport.parse, file) if result_cache is not None else KrakenReport.parse(file)
+    if cache:
+        try:
+            report.save(store, source=file)
+        except OSError:
+            logging.warning(f"Could not write Kraken report store {store}")
+    return report
+
+logging.debug("Function for finding one report per sample in a directory, preferring store files over text reports")
+def find_reports(directory='data'):
+    reports = {report_sample(file): file for file in glob.glob(os.path.join(directory, '*.kraken.txt'))}
+    reports.update({report_sample(file): file for file in glob.glob(os.path.join(directory, '*.kraken.npz'))})
+    return sorted(reports.values())
+
+logging.debug("Function for evaluating a list of taxon rules across all reports in one call")
+def evaluate_rules(reports, rules):
+    """
+    Each rule is a dict with a Rule name, a Query and a Taxid, and optional Rank, Min and Max.
+    Query 'clade' is the clade percent of the taxid. Query 'outside' is the top Rank row outside the clade of the taxid.
+    """
+    results = []
+    for report in reports:
+        result = {'Sample': report.sample}
+        for rule in rules:
+            name = rule['Rule']
+            taxon = ''
+            if rule['Query'] == 'clade':
+                value = report.percent_of(rule['Taxid']) or 0.0
+            elif rule['Query'] == 'outside':
+                top = report.top(rule['Rank'], 1, outside=rule['Taxid'])
+                value = float(report.percent[top[0]]) if len(top) else 0.0
+                taxon = str(report.name[top[0]]) if len(top) else ''
+                result[f'{name} Taxon'] = taxon
+            else:
+                raise ValueError(f"Unknown rule query: {rule['Query']}")
+            passed = True
+            if rule.get('Min') not in (None, ''):
+                passed &= value >= float(rule['Min'])
+            if rule.get('Max') not in (None, ''):
+                passed &= value < float(rule['Max'])
+            result[name] = value
+            result[f'{name} Pass'] = passed
+        results.append(result)
+    return results
+
+def read_rules(file):
+    with open(file, 'r') as inFile:
+        header = inFile.readline().rstrip('\n').split('\t')
+        return [dict(zip(header, line.rstrip('\n').split('\t'))) for line in inFile if line.strip()]
+
+def main(args=None):
+    args = parse_args(args)
+
+    if args.rules:
+        logging.info(f"Evaluating taxon rules across {len(args.reports)} Kraken reports")
+        results = evaluate_rules([load_report(file) for file in args.reports], read_rules(args.rules))
+        columns = list(dict.fromkeys(column for result in results for column in result))
+        with open('kraken_rules.tsv', 'w') as outFile:
+            outFile.write('\t'.join(columns) + '\n')
+            for result in results:
+                outFile.write('\t'.join(str(result.get(column, '')) for column in columns) + '\n')
+        return
+
+    logging.info(f"Storing {len(args.reports)} Kraken reports")
+    for file in args.reports:
+        KrakenReport.parse(file).save(store_path(file, args.outdir), source=file)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import glob
+import time
+import fnmatch
+import argparse
+import logging
+import tempfile
+
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s : %(message)s')
+
+from bbduk_summary import summarize_bbduk
+from quality_stats import summarize_qual
+from quast_summary import summarize_quast
+from assembly_stats_summary import summarize_assembly_file
+from coverage_stats import summarize_depth
+from percent_strep_summary import strep_percents
+from seroba_summary import summarize_seroba
+from kraken_report import load_report, report_sample
+from result_cache import ResultCache
+
+logging.debug("Per-sample report columns, in report order, that are known as soon as the task of a sample is published")
+LIVE_COLUMNS = ['Sample', 'Run', 'Total Reads', 'Reads Removed', 'Median Read Quality', 'Average Read Quality', 'Contigs (#)', 'N50',
+                'Assembly Length (bp)', 'Ratio of Actual:Expected Genome Length', 'z-score', 'Median Coverage', 'Average Coverage',
+                'Percent Strep', 'Percent SPN', 'SecondGenus', 'Percent SecondGenus', 'Serotype']
+
+logging.debug("The final report is written as a CSV or in any of the other formats of create_report.py")
+REPORT_FORMATS = ['csv', 'parquet', 'arrow', 'ndjson']
+
+logging.debug("Published directory of the depth files for each coverage mode")
+COVERAGE_SOURCES = {'samtools': ('compact_depth', '*.depth.npy'), 'stream': ('sam_depth', '*.depth.npy'), 'contigs': ('shovill', '*.contigs.fa')}
+
+def parse_args(args=None):
+    Description='Build the SPNtypeID report incrementally from the per-sample files published to the output directory, while the workflow runs.'
+    Epilog='Use with live_report.py --outdir <OUTDIR> --workflowRunName <RUN_NAME> [--interval <SECONDS>] [--timeout <SECONDS>] [--once]'
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument('--outdir',
+        required=True,
+        help='Workflow output directory (--outdir of the run).')
+    parser.add_argument('--workflowRunName',
+        required=True,
+        help='Run name, as given to the workflow with --runname.')
+    parser.add_argument('--output',
+        help='Checkpoint CSV (default: <OUTDIR>/live_report/<RUN_NAME>_live_report.csv).')
+    parser.add_argument('--interval',
+        type=float,
+        default=30,
+        help='Seconds between scans of the output directory (default: 30).')
+    parser.add_argument('--timeout',
+        type=float,
+        default=21600,
+        help='Stop following the run when no per-sample file was new or changed for this many seconds, e.g. because the run failed before its final report, 0 never stops (default: 21600).')
+    parser.add_argument('--once',
+        action='store_true',
+        help='Scan once, write the checkpoint and exit, instead of following the run until its final report is written.')
+    parser.add_argument('--coverage_mode',
+        choices=list(COVERAGE_SOURCES),
+        default='samtools',
+        help='Coverage mode of the run, decides which published depth files are read (default: samtools).')
+    parser.add_argument('--maxcontigs',
+        default=300,
+        help='Same as the workflow parameter (default: 300).')
+    parser.add_argument('--minavgreadq',
+        default=30,
+        help='Same as the workflow parameter (default: 30).')
+    parser.add_argument('--mincoverage',
+        default=40,
+        help='Same as the workflow parameter (default: 40).')
+    return parser.parse_args(args)
+
+logging.debug("Parsers of the published per-sample files, each gives the sample and its report columns")
+def bbduk_record(cache, file):
+    sample, total_reads, reads_removed = cache(summarize_bbduk, file)
+    return sample, {'Total Reads': total_reads, 'Reads Removed': reads_removed}
+
+def quality_record(cache, file, minavgreadq):
+    sample, median, average = cache(summarize_qual, file, minavgreadq).split('\t')[:3]
+    return sample, {'Median Read Quality': median, 'Average Read Quality': average}
+
+def quast_record(cache, file, maxcontigs):
+    row = cache(summarize_quast, file, maxcontigs).iloc[0]
+    return row['Sample'], {'Contigs (#)': row['Contigs'], 'N50': row['N50'], 'Assembly Length (bp)': row['Assembly Length (bp)']}
+
+def assembly_record(cache, file):
+    row = cache(summarize_assembly_file, file).iloc[0]
+    return row['Sample'], {'Ratio of Actual:Expected Genome Length': row['Ratio of Actual:Expected Genome Length'], 'z-score': row['z-score']}
+
+def coverage_record(cache, file, mincoverage):
+    sample, median, average = cache(summarize_depth, file, mincoverage).split('\t')[:3]
+    return sample, {'Median Coverage': median, 'Average Coverage': average}
+
+def kraken_record(cache, file):
+    percent_strep, percent_spn, secondgenus, percent_secondgenus = strep_percents(load_report(file, cache=False, result_cache=cache))
+    return report_sample(file), {'Percent Strep': percent_strep, 'Percent SPN': percent_spn,
+                                 'SecondGenus': secondgenus, 'Percent SecondGenus': percent_secondgenus}
+
+def seroba_record(cache, file):
+    row = cache(summarize_seroba, file).iloc[0]
+    return row['Sample'], {'Serotype': row['Serotype']}
+
+class LiveReport:
+    """Report rows kept in memory and updated from the per-sample files that are new or changed since the last scan."""
+
+    def __init__(self, outdir, run, coverage_mode='samtools', maxcontigs=300, minavgreadq=30, mincoverage=40, cache=None):
+        self.outdir = outdir
+        self.run = run
+        self.records = {}
+        self._cache = cache if cache is not None else ResultCache()
+        self._seen = {}
+        self._pending = {}
+        self._stats = {}
+        self.last_change = time.monotonic()
+        coverage_dir, coverage_pattern = COVERAGE_SOURCES[coverage_mode]
+        self._sources = [('bbduk', '*.trim.txt', bbduk_record, ()),
+                         ('fastq_stats', '*.fastq_stats.npz', quality_record, (minavgreadq,)),
+                         ('quast', '*.transposed.quast.report.tsv', quast_record, (maxcontigs,)),
+                         ('calculate_assembly_stats', '*_Assembly_ratio_*', assembly_record, ()),
+                         (coverage_dir, coverage_pattern, coverage_record, (mincoverage,)),
+                         ('kraken_sample', '*.kraken.txt', kraken_record, ()),
+                         ('kraken_batch_report', '*.kraken.txt', kraken_record, ()),
+                         ('seroba', '*.pred.csv', seroba_record, ())]
+
+    def _files(self):
+        for directory, pattern, parse, args in self._sources:
+            try:
+                entries = list(os.scandir(os.path.join(self.outdir, directory)))
+            except OSError:
+                continue
+            for entry in entries:
+                if fnmatch.fnmatch(entry.name, pattern) and entry.is_file():
+                    stat = entry.stat()
+                    yield entry.path, (stat.st_size, stat.st_mtime_ns), parse, args
+
+    def scan(self, settled=True):
+        """
+        Parse the files that are new or changed since the last scan, returns the number of records updated.
+        With settled, a file is only parsed once it is the same size and age on two scans in a row, so files that are still being published are left for the next scan.
+        """
+        updated = 0
+        for path, stat, parse, args in self._files():
+            if self._stats.get(path) != stat:
+                self._stats[path] = stat
+                self.last_change = time.monotonic()
+            if self._seen.get(path) == stat:
+                continue
+            if settled and self._pending.get(path) != stat:
+                self._pending[path] = stat
+                continue
+
+            try:
+                sample, record = parse(self._cache, path, *args)
+            except Exception as error:
+                logging.warning(f"Could not read {path}, trying again on the next scan: {error}")
+                self._pending.pop(path, None)
+                continue
+
+            self._pending.pop(path, None)
+            self._seen[path] = stat
+            self.records.setdefault(str(sample), {}).update(record)
+            updated += 1
+        return updated
+
+    def dataframe(self):
+        df = pd.DataFrame.from_dict(self.records, orient='index').reindex(columns=LIVE_COLUMNS[2:])
+        df.index.name = 'Sample'
+        df = df.reset_index().assign(Run=self.run)
+        return df[LIVE_COLUMNS].sort_values('Sample', kind='stable', ignore_index=True)
+
+    def write(self, file):
+        """Write the checkpoint to a temporary file first, so readers always see a complete report."""
+        directory = os.path.dirname(file) or '.'
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False, newline='') as outFile:
+            self.dataframe().to_csv(outFile, index=False, sep=',', encoding='utf-8')
+        os.replace(outFile.name, file)
+
+    def finished(self):
+        """The run is over once its final report is published, in any format."""
+        return any(glob.glob(os.path.join(self.outdir, 'report_*_ntc', f'{self.run}_spntypeid_report.{extension}')) for extension in REPORT_FORMATS)
+
+    def close(self):
+        self._cache.close()
+
+def main(args=None):
+    args = parse_args(args)
+
+    output = args.output or os.path.join(args.outdir, 'live_report', f'{args.workflowRunName}_live_report.csv')
+    live = LiveReport(args.outdir, args.workflowRunName, args.coverage_mode, args.maxcontigs, args.minavgreadq, args.mincoverage)
+
+    if args.once:
+        live.scan(settled=False)
+        live.write(output)
+        logging.info(f"Wrote {len(live.records)} samples to {output}")
+        live.close()
+        return
+
+    logging.info(f"Following {args.outdir} every {args.interval:g} seconds, writing {output}")
+    while True:
+        logging.debug("Check for the final report before scanning, so the last scan reads every file the run published")
+        finished = live.finished()
+        updated = live.scan(settled=not finished)
+        if updated or finished or not os.path.exists(output):
+            live.write(output)
+            logging.info(f"{updated} records updated, {len(live.records)} samples in {output}")
+        if finished:
+            break
+        if args.timeout and time.monotonic() - live.last_change > args.timeout:
+            logging.warning(f"No new or changed files in {args.outdir} for {args.timeout:g} seconds and no final report, stopping")
+            live.close()
+            return 1
+        time.sleep(args.interval)
+
+    live.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
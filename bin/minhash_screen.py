@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import gzip
+import argparse
+import logging
+
+import numpy as np
+
+from kmer_sketch import kmer_hashes, read_pairs
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s : %(message)s')
+
+def parse_args(args=None):
+    Description='Build bottom-k MinHash reference sketches, or screen paired reads against them.'
+    Epilog='Use with minhash_screen.py build --name <NAME> -o <SKETCH> <FASTA...> or minhash_screen.py screen <R1> <R2> --sketches <SKETCH...>'
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help='Build a reference sketch from one or more FASTA files.')
+    build.add_argument('fastas',
+        nargs='+',
+        help='Reference genome FASTA files (optionally gzipped), all are added to one sketch.')
+    build.add_argument('--name',
+        required=True,
+        help='Reference name reported in the screen output, e.g. "Streptococcus pneumoniae".')
+    build.add_argument('-o', '--output',
+        required=True,
+        help='Output sketch file (.npz).')
+    build.add_argument('-k', '--kmer',
+        type=int,
+        default=21,
+        help='K-mer size, at most 31 (default: 21).')
+    build.add_argument('-s', '--size',
+        type=int,
+        default=1000,
+        help='Number of smallest hashes kept in the sketch (default: 1000).')
+
+    screen = subparsers.add_parser('screen', help='Screen paired reads against reference sketches.')
+    screen.add_argument('fastqs',
+        nargs=2,
+        help='Gzipped R1 and R2 FASTQ files.')
+    screen.add_argument('--sketches',
+        nargs='+',
+        required=True,
+        help='Reference sketches from minhash_screen.py build. The first sketch is the target species.')
+    screen.add_argument('--sample',
+        help='Sample id (default: R1 file name up to the first "_").')
+    screen.add_argument('--min_containment',
+        type=float,
+        default=0.5,
+        help='Minimum containment of the target sketch for a sample to pass (default: 0.5).')
+    screen.add_argument('--batch',
+        type=int,
+        default=50000,
+        help='Number of read pairs hashed together (default: 50000).')
+    return parser.parse_args(args)
+
+logging.debug("Function for reading all sequences of a FASTA file as bytes")
+def read_fasta(file):
+    opener = gzip.open if file.endswith('.gz') else open
+    seqs = []
+    seq = []
+    with opener(file, 'rb') as inFile:
+        for line in inFile:
+            if line.startswith(b'>'):
+                if seq:
+                    seqs.append(b''.join(seq))
+                seq = []
+            else:
+                seq.append(line.strip())
+    if seq:
+        seqs.append(b''.join(seq))
+    return seqs
+
+def build_sketch(fastas, name, output, k=21, size=1000):
+
+    logging.info(f"Building {name} sketch from {len(fastas)} FASTA files")
+    hashes = np.unique(np.concatenate([kmer_hashes(read_fasta(fasta), k) for fasta in fastas]))
+    np.savez(output, name=name, kmer=k, hashes=hashes[:size])
+
+class ReferenceSketch:
+    """Bottom-k reference sketch and the read hits collected against it."""
+
+    def __init__(self, file):
+        with np.load(file) as sketch:
+            self.name = str(sketch['name'])
+            self.kmer = int(sketch['kmer'])
+            self.hashes = sketch['hashes']
+        self.max_hash = self.hashes[-1] if len(self.hashes) else np.uint64(0)
+        self.seen = np.zeros(len(self.hashes), dtype=bool)
+        self.below = 0
+        self.matched = 0
+
+    def add(self, hashes):
+        """Read k-mers below the largest sketch hash are a uniform sample, the reference k-mers among them are exactly the sketch."""
+        hits = hashes[hashes <= self.max_hash]
+        self.below += len(hits)
+        self.matched += int(np.isin(hits, self.hashes).sum())
+        self.seen |= np.isin(self.hashes, hits)
+
+    def containment(self):
+        return round(float(self.seen.mean()), 4) if len(self.seen) else 0.0
+
+    def percent(self):
+        return round(self.matched / self.below * 100, 2) if self.below else 0.0
+
+def screen_reads(r1, r2, sketches, batch=50000):
+
+    pairs = 0
+    seqs = []
+
+    def flush(seqs):
+        for k in set(sketch.kmer for sketch in sketches):
+            hashes = kmer_hashes(seqs, k)
+            for sketch in sketches:
+                if sketch.kmer == k:
+                    sketch.add(hashes)
+
+    for seq1, seq2 in read_pairs(r1, r2):
+        pairs += 1
+        seqs.append(seq1)
+        seqs.append(seq2)
+        if len(seqs) >= 2 * batch:
+            flush(seqs)
+            seqs = []
+    if seqs:
+        flush(seqs)
+
+    return pairs
+
+def main(args=None):
+    args = parse_args(args)
+
+    if args.command == 'build':
+        build_sketch(args.fastas, args.name, args.output, args.kmer, args.size)
+        return
+
+    sid = args.sample or os.path.basename(args.fastqs[0]).split('_')[0]
+    sketches = [ReferenceSketch(file) for file in args.sketches]
+
+    logging.info(f"Screening reads for {sid}")
+    pairs = screen_reads(args.fastqs[0], args.fastqs[1], sketches, args.batch)
+
+    logging.debug("Pass or fail is decided by the target (first) sketch")
+    target = sketches[0]
+    pass_screen = pairs > 0 and target.containment() >= args.min_containment
+    if pairs == 0:
+        comment = "No reads"
+    elif not pass_screen:
+        comment = f"{target.name} containment < {args.min_containment}"
+    else:
+        comment = ""
+
+    with open(f'{sid}.minhash_screen.tsv', 'w') as outFile:
+        outFile.write("Sample\tReference\tContainment\tEstimated Percent\tRead Pairs\tPass MinHash Screen\tMinHash Screen Comments\n")
+        for sketch in sketches:
+            outFile.write(f"{sid}\t{sketch.name}\t{sketch.containment()}\t{sketch.percent()}\t{pairs}\t{pass_screen}\t{comment}\n")
+
+    logging.debug("Print the pass flag so the workflow can branch on it")
+    print(pass_screen)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,12 @@
 #!/usr/bin/env python3
 
 import sys
-import glob
 import csv
 import argparse
 import logging
 
+from kraken_report import find_reports, load_report, report_sample
+
 logging.basicConfig(level = logging.INFO, format = '%(levelname)s : %(message)s')
 
 def parse_args(args=None):
@@ -21,6 +22,23 @@ def parse_args(args=None):
         help='This is supplied by the nextflow config and can be changed via the usual methods i.e. command line.')
     return parser.parse_args(args)
 
+logging.debug("Function for the Strep and SPN percents of a report, and the genus with the highest percent outside the Streptococcus clade")
+def strep_percents(report):
+    percent_strep = report.percent_of(1301)
+    percent_spn = report.percent_of(1313)
+    secondgenus = ""
+    percent_secondgenus = 0.0
+
+    top = report.top("G", 1, outside=1301)
+    if len(top) and report.percent[top[0]] > percent_secondgenus:
+        secondgenus = str(report.name[top[0]])
+        percent_secondgenus = float(report.percent[top[0]])
+
+    return (percent_strep if percent_strep is not None else 0.0,
+            percent_spn if percent_spn is not None else 0.0,
+            secondgenus,
+            percent_secondgenus)
+
 def main(args=None):
     args = parse_args(args)
 
@@ -36,49 +54,25 @@ def main(args=None):
             self.pass_kraken = False
 
     logging.debug("Get list of result files")
-    kraken_list = glob.glob("data/*.kraken.txt")
+    kraken_list = find_reports("data")
 
     results = {}
 
     logging.debug("Collecting all kraken results")
     for file in kraken_list:
-        id = file.split("/")[1].split(".kraken.txt")[0]
+        id = report_sample(file)
         result = result_values(id)
 
-        with open(file,'r') as csvfile:
-            dialect = csv.Sniffer().sniff(csvfile.read(1024))
-            csvfile.seek(0)
-            reader = csv.reader(csvfile,dialect)
-            secondgenus = ""
-            percent_secondgenus = 0.0
-
-            for row in reader:
-                if row[4] == "1301":
-                    result.percent_strep = float(row[0])
-                    continue
-                if row[4] == "1313":
-                    result.percent_spn = float(row[0])
-                    continue
-                if row[3] == "G" and float(row[0]) > percent_secondgenus:
-                    secondgenus = row[5].strip()
-                    percent_secondgenus = float(row[0])
-
-            result.secondgenus = secondgenus
-            result.percent_secondgenus = percent_secondgenus
-            if result.percent_spn == "NotRun":
-                result.percent_spn = 0.0
-            if result.percent_secondgenus == "NotRun":
-                result.percent_secondgenus = 0.0
-            if result.percent_strep == "NotRun":
-                result.percent_strep = 0.0
-            if result.percent_strep >= float(args.minpctstrep) and result.percent_spn >= float(args.minpctspn) and result.percent_secondgenus < float(args.maxpctother):
-                result.pass_kraken = True
-            if result.percent_strep < float(args.minpctstrep):
-                result.comments.append(f"Less than {args.minpctstrep}% of reads are Strep")
-            if result.percent_spn < float(args.minpctspn):
-                result.comments.append(f"Less than {args.minpctspn}% of reads are SPN")
-            if result.percent_secondgenus >= float(args.maxpctother):
-                result.comments.append(f"More than {args.maxpctother}% of reads are from "+secondgenus)
+        result.percent_strep, result.percent_spn, secondgenus, result.percent_secondgenus = strep_percents(load_report(file))
+        result.secondgenus = secondgenus
+        if result.percent_strep >= float(args.minpctstrep) and result.percent_spn >= float(args.minpctspn) and result.percent_secondgenus < float(args.maxpctother):
+            result.pass_kraken = True
+        if result.percent_strep < float(args.minpctstrep):
+            result.comments.append(f"Less than {args.minpctstrep}% of reads are Strep")
+        if result.percent_spn < float(args.minpctspn):
+            result.comments.append(f"Less than {args.minpctspn}% of reads are SPN")
+        if result.percent_secondgenus >= float(args.maxpctother):
+            result.comments.append(f"More than {args.maxpctother}% of reads are from "+secondgenus)
 
         results[id] = result
 
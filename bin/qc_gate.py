@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import argparse
+import logging
+
+import numpy as np
+
+from kmer_sketch import expected_genome_length
+from coverage_stats import histogram_median_average
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s : %(message)s')
+
+def parse_args(args=None):
+    Description='Decide from read histograms whether a sample will fail QC, so assembly and typing can be skipped.'
+    Epilog='Use with qc_gate.py <FASTQ_STATS_NPZ> -d <NCBI_ASSEMBLY_STATS> --minavgreadq <MINAVGREADQ> --mincoverage <MINCOVERAGE>'
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument('fastq_stats',
+        help='Read histograms (.fastq_stats.npz) from fastq_stats.py.')
+    parser.add_argument('--sample',
+        help='Sample id (default: file name up to the first ".").')
+    parser.add_argument('-d', '--path_database',
+        required=True,
+        help='Path to the NCBI assembly stats database, used for the expected genome length.')
+    parser.add_argument('--minavgreadq',
+        type=int,
+        required=True,
+        help='Minimum average read quality, same as quality_stats.py.')
+    parser.add_argument('--mincoverage',
+        type=float,
+        required=True,
+        help='Minimum coverage, same as coverage_stats.py.')
+    parser.add_argument('--depth_margin',
+        type=float,
+        default=0.8,
+        help='Fail on depth only if the estimated depth is below DEPTH_MARGIN * MINCOVERAGE, since it is estimated from raw reads and the expected genome length (default: 0.8).')
+    return parser.parse_args(args)
+
+logging.debug("Function for getting read count, base count and mean read quality from fastq_stats.py histograms")
+def read_summary(file):
+    with np.load(file) as hists:
+        reads = int(hists['mean_qual'].sum())
+        bases = int(np.dot(hists['length'], np.arange(len(hists['length']), dtype=np.int64)))
+        _, avg = histogram_median_average(hists['mean_qual'])
+    return reads, bases, avg
+
+def gate(reads, bases, avg, expected_length, minavgreadq, mincoverage, depth_margin=0.8):
+
+    depth = bases / expected_length
+    comments = []
+    if reads == 0:
+        comments.append("No reads")
+    if avg < minavgreadq:
+        comments.append(f"Average read quality < {minavgreadq}")
+    if depth < mincoverage * depth_margin:
+        comments.append(f"Estimated depth < {mincoverage:g}")
+
+    return depth, not comments, ';'.join(comments)
+
+def main(args=None):
+    args = parse_args(args)
+
+    sid = args.sample or os.path.basename(args.fastq_stats).split('.')[0]
+
+    logging.info(f"Checking read QC for {sid}")
+    reads, bases, avg = read_summary(args.fastq_stats)
+    expected_length, _ = expected_genome_length(args.path_database)
+    depth, pass_gate, comments = gate(reads, bases, avg, expected_length, args.minavgreadq, args.mincoverage, args.depth_margin)
+
+    with open(f'{sid}.qc_gate.tsv', 'w') as outFile:
+        outFile.write("Sample\tGate Reads\tGate Bases\tGate Average Read Quality\tEstimated Depth\tPass QC Gate\tQC Gate Comments\n")
+        outFile.write(f"{sid}\t{reads}\t{bases}\t{avg}\t{round(depth, 2)}\t{pass_gate}\t{comments}\n")
+
+    logging.debug("Print the pass flag so the workflow can branch on it")
+    print(pass_gate)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,14 +5,18 @@ import glob
 import argparse
 import logging
 
-from functools import partial
+import numpy as np
+
 from numpy import median
 from numpy import average
 
+from result_cache import ResultCache
+from coverage_stats import histogram_median_average
+
 logging.basicConfig(level = logging.INFO, format = '%(levelname)s : %(message)s')
 
 def parse_args(args=None):
-	Description='A script to summarize stats'
+	Description='A script to summarize read quality from fastq_stats.py histograms or bioawk quality files'
 	Epilog='Use with quality_stats.py <MINAVGREADQ>'
 
 	parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
@@ -20,42 +24,51 @@ def parse_args(args=None):
 	    help='This is supplied by the nextflow config and can be changed via the usual methods i.e. command line.')
 	return parser.parse_args(args)
 
-logging.debug("Function for summarizing samtools depth files")
+logging.debug("Function for summarizing read quality files")
 def summarize_qual(file, minavgreadq):
-    logging.debug("Get sample id from file name and set up data list")
+    logging.debug("Get sample id from file name")
     sid = os.path.basename(file).split('.')[0]
-    data = []
 
-    logging.debug("Open bioawk depth file and get read quality")
-    with open(file,'r') as inFile:
-        for line in inFile:
-            data.append(int(float(line.strip().split()[0])))
+    if file.endswith('.fastq_stats.npz'):
+        logging.debug("Get median and average read quality, read length and GC from fastq_stats.py histograms")
+        with np.load(file) as hists:
+            med, avg = histogram_median_average(hists['mean_qual'])
+            _, avg_length = histogram_median_average(hists['length'])
+            _, gc_avg = histogram_median_average(hists['gc'])
+    else:
+        logging.debug("Open bioawk quality file and get read quality")
+        data = []
+        with open(file,'r') as inFile:
+            for line in inFile:
+                data.append(int(float(line.strip().split()[0])))
 
-    logging.debug("Get median and read quality")
-    med = int(float(median(data)))
-    avg = int(float(average(data)))
+        logging.debug("Get median and read quality")
+        med = int(float(median(data)))
+        avg = int(float(average(data)))
+        avg_length = 'NA'
+        gc_avg = 'NA'
 
-    logging.debug("Return sample id, median and average depth, and check for coverage fail")
+    logging.debug("Return sample id, median and average read quality, and check for quality fail")
     if avg >= int(minavgreadq):
-        result = f"{sid}\t{med}\t{avg}\tTRUE\t\n"
+        result = f"{sid}\t{med}\t{avg}\tTRUE\t\t{avg_length}\t{gc_avg}\n"
     if avg < int(minavgreadq):
-        result = f"{sid}\t{med}\t{avg}\tFALSE\tAverage read quality < {minavgreadq}\n"
+        result = f"{sid}\t{med}\t{avg}\tFALSE\tAverage read quality < {minavgreadq}\t{avg_length}\t{gc_avg}\n"
     return result
 
 def main(args=None):
     args = parse_args(args)
 
-    logging.info("Obtaining all bioawk quality files")
-    files = glob.glob("data*/*.qual.tsv")
-
-    summarize_qual_partial = partial(summarize_qual, minavgreadq=args.minavgreadq)
+    logging.info("Obtaining all read quality files")
+    files = glob.glob("data*/*.fastq_stats.npz") + glob.glob("data*/*.qual.tsv")
 
     logging.info("Summarizing read quality")
-    results = map(summarize_qual_partial,files)
+    cache = ResultCache()
+    results = [cache(summarize_qual, file, args.minavgreadq) for file in files]
+    cache.close()
 
     logging.info("Writing results to output file")
     with open('quality_stats.tsv', 'w') as outFile:
-        outFile.write("Sample\tMedian Read Quality\tAverage Read Quality\tPass Average Read Quality\tQuality Stats Comments\n")
+        outFile.write("Sample\tMedian Read Quality\tAverage Read Quality\tPass Average Read Quality\tQuality Stats Comments\tAverage Read Length\tAverage GC (%)\n")
         for result in results:
             outFile.write(result)
 
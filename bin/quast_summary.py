@@ -6,7 +6,8 @@ import argparse
 import logging
 
 import pandas as pd
-from functools import partial
+
+from result_cache import ResultCache
 
 logging.basicConfig(level = logging.INFO, format = '%(levelname)s : %(message)s')
 
@@ -59,11 +60,10 @@ def main(args=None):
     logging.info("Obtaining all QUAST output files")
     files = glob.glob('data*/*.transposed.quast.report.tsv*')
 
-    summarize_quast_partial = partial(summarize_quast, maxcontigs=args.maxcontigs)
-
     logging.info("Summarizing quast output files")
-    dfs = map(summarize_quast_partial,files)
-    dfs = list(dfs)
+    cache = ResultCache()
+    dfs = [cache(summarize_quast, file, args.maxcontigs) for file in files]
+    cache.close()
 
     logging.debug("Concatenate dfs and write data frame to file")
     if len(dfs) > 1:
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import glob
+import pickle
+import hashlib
+import inspect
+import argparse
+import logging
+import tempfile
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s : %(message)s')
+
+logging.debug("The cache is only used when the directory is set, the size cap is in MB")
+CACHE_DIR_ENV = 'SPNTYPEID_CACHE_DIR'
+CACHE_SIZE_ENV = 'SPNTYPEID_CACHE_MAX_MB'
+
+def parse_args(args=None):
+    Description='Show or trim the on-disk cache of parsed per-sample results shared by the summary scripts.'
+    Epilog='Use with result_cache.py [--cache_dir <DIR>] [--max_mb <MB>] [--clear]'
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument('--cache_dir',
+        help=f'Cache directory (default: ${CACHE_DIR_ENV}).')
+    parser.add_argument('--max_mb',
+        type=float,
+        help=f'Evict the least recently used records until the cache is at most this size (default: ${CACHE_SIZE_ENV} or 1024).')
+    parser.add_argument('--clear',
+        action='store_true',
+        help='Remove every cached record.')
+    return parser.parse_args(args)
+
+logging.debug("Function for the sha256 of a file, read in blocks")
+def file_digest(file, blocksize=1 << 20):
+    digest = hashlib.sha256()
+    with open(file, 'rb') as inFile:
+        for block in iter(lambda: inFile.read(blocksize), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+logging.debug("Function for the source files of a module and of the modules it imports from its own directory, followed through their imports")
+def local_sources(module):
+    directory = os.path.dirname(os.path.abspath(module.__file__))
+    sources = set()
+    modules = [module]
+    while modules:
+        module = modules.pop()
+        source = os.path.abspath(module.__file__)
+        if source in sources:
+            continue
+        sources.add(source)
+        for value in vars(module).values():
+            imported = value if inspect.ismodule(value) else inspect.getmodule(value)
+            if imported is not None and getattr(imported, '__file__', None) and os.path.dirname(os.path.abspath(imported.__file__)) == directory:
+                modules.append(imported)
+    return sources
+
+class ResultCache:
+    """Parsed per-sample records on disk, keyed by the input content and name, the parser scripts and the parser arguments, evicted least recently used first."""
+
+    def __init__(self, directory=None, max_mb=None):
+        self.directory = directory if directory is not None else os.environ.get(CACHE_DIR_ENV) or None
+        self.max_bytes = int(float(max_mb if max_mb is not None else os.environ.get(CACHE_SIZE_ENV) or 1024) * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._versions = {}
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _version(self, parse):
+        """
+        The parser version is the content of the script that defines it and of the scripts next to it that it imports,
+        so any change to the parser or to a helper it uses starts a new record.
+        """
+        source = inspect.getfile(parse)
+        if source not in self._versions:
+            self._versions[source] = ':'.join(f"{os.path.basename(script)}:{file_digest(script)}" for script in sorted(local_sources(inspect.getmodule(parse))))
+        return self._versions[source]
+
+    def key(self, parse, file, args):
+        """The file name is part of the key, since parsers take the sample name from it."""
+        digest = hashlib.sha256(f"{self._version(parse)}:{parse.__qualname__}:{os.path.basename(file)}:{args!r}".encode())
+        digest.update(file_digest(file).encode())
+        return digest.hexdigest()
+
+    def __call__(self, parse, file, *args):
+        """parse(file, *args), from the cache when the same file was parsed the same way before."""
+        if not self.directory or not os.path.isfile(file):
+            return parse(file, *args)
+
+        path = os.path.join(self.directory, f"{self.key(parse, file, args)}.pkl")
+        try:
+            with open(path, 'rb') as inFile:
+                record = pickle.load(inFile)
+            os.utime(path)
+            self.hits += 1
+            return record
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+
+        record = parse(file, *args)
+        self.misses += 1
+        try:
+            with tempfile.NamedTemporaryFile(dir=self.directory, suffix='.tmp', delete=False) as outFile:
+                pickle.dump(record, outFile, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(outFile.name, path)
+        except OSError:
+            logging.warning(f"Could not write result cache record {path}")
+        return record
+
+    def evict(self):
+        """Remove the least recently used records until the cache is under the size cap."""
+        if not self.directory:
+            return 0
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*.pkl')):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def close(self):
+        if self.directory:
+            removed = self.evict()
+            logging.info(f"Result cache: {self.hits} records reused, {self.misses} files parsed, {removed} records evicted")
+
+def main(args=None):
+    args = parse_args(args)
+
+    cache = ResultCache(args.cache_dir, 0 if args.clear else args.max_mb)
+    if not cache.directory:
+        logging.critical(f"No cache directory, use --cache_dir or set ${CACHE_DIR_ENV}")
+        sys.exit(1)
+
+    removed = cache.evict()
+    records = glob.glob(os.path.join(cache.directory, '*.pkl'))
+    logging.info(f"Removed {removed} records, {len(records)} records ({sum(os.path.getsize(path) for path in records) / 1024 / 1024:.1f} MB) left")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import csv
+import sqlite3
+import argparse
+import logging
+import datetime
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s : %(message)s')
+
+logging.debug("Report columns stored per sample, with their database column and type")
+SAMPLE_COLUMNS = {
+    'Sample': ('sample', 'TEXT'),
+    'Total Reads': ('total_reads', 'INTEGER'),
+    'Reads Removed': ('reads_removed', 'TEXT'),
+    'Median Read Quality': ('median_read_quality', 'REAL'),
+    'Average Read Quality': ('average_read_quality', 'REAL'),
+    'Contigs (#)': ('contigs', 'INTEGER'),
+    'N50': ('n50', 'INTEGER'),
+    'Assembly Length (bp)': ('assembly_length', 'INTEGER'),
+    'Ratio of Actual:Expected Genome Length': ('length_ratio', 'REAL'),
+    'z-score': ('z_score', 'REAL'),
+    'Median Coverage': ('median_coverage', 'REAL'),
+    'Average Coverage': ('average_coverage', 'REAL'),
+    'Percent Strep': ('percent_strep', 'REAL'),
+    'Percent SPN': ('percent_spn', 'REAL'),
+    'SecondGenus': ('second_genus', 'TEXT'),
+    'Percent SecondGenus': ('percent_second_genus', 'REAL'),
+    'Serotype': ('serotype', 'TEXT'),
+    'Max NTC read': ('max_ntc_reads', 'INTEGER'),
+    'Max NTC SPN read': ('max_ntc_spn_reads', 'INTEGER'),
+    'All NTC reads': ('all_ntc_reads', 'TEXT'),
+    'All NTC SPN reads': ('all_ntc_spn_reads', 'TEXT'),
+    'Sketch Comparison Flags': ('sketch_flags', 'TEXT'),
+    'QC Gate Comments': ('qc_gate_comments', 'TEXT'),
+}
+
+logging.debug("Illumina run folder names start with <YYMMDD>_<instrument>_")
+RUN_NAME_PATTERN = re.compile(r'(?:^|_)(\d{6})_([A-Za-z0-9-]+)_')
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    run TEXT PRIMARY KEY,
+    run_date TEXT,
+    instrument TEXT,
+    workflow_version TEXT,
+    kraken_db TEXT,
+    samples INTEGER,
+    source TEXT,
+    ingested TEXT
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run TEXT NOT NULL,
+    run_date TEXT,
+    instrument TEXT,
+    {', '.join(f'{name} {kind}' for name, kind in SAMPLE_COLUMNS.values())},
+    PRIMARY KEY (run, sample)
+);
+CREATE INDEX IF NOT EXISTS samples_sample ON samples (sample);
+CREATE INDEX IF NOT EXISTS samples_date ON samples (run_date);
+CREATE INDEX IF NOT EXISTS samples_serotype_date ON samples (serotype, run_date);
+CREATE INDEX IF NOT EXISTS samples_instrument_date ON samples (instrument, run_date);
+"""
+
+def parse_args(args=None):
+    Description='Keep a local SQLite history of SPNtypeID reports and answer cohort questions across runs.'
+    Epilog='Use with run_history.py ingest --db <DB> <REPORT_CSV...> or run_history.py serotypes --db <DB> --since <YYYY-MM-DD>'
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    database = argparse.ArgumentParser(add_help=False)
+    database.add_argument('--db',
+        default='spntypeid_history.sqlite',
+        help='SQLite database file (default: spntypeid_history.sqlite).')
+    dates = argparse.ArgumentParser(add_help=False)
+    dates.add_argument('--since',
+        help='First run date included (YYYY-MM-DD).')
+    dates.add_argument('--until',
+        help='Last run date included (YYYY-MM-DD).')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest = subparsers.add_parser('ingest', parents=[database], help='Load report CSVs, a run that is already in the database is replaced.')
+    ingest.add_argument('reports',
+        nargs='+',
+        help='<run>_spntypeid_report.csv files.')
+    ingest.add_argument('--run_date',
+        help='Run date (YYYY-MM-DD) for all reports (default: from an Illumina style run name, else the report modification date).')
+    ingest.add_argument('--instrument',
+        help='Sequencer for all reports (default: from an Illumina style run name).')
+    ingest.add_argument('--batch',
+        type=int,
+        default=10000,
+        help='Number of rows inserted per batch (default: 10000).')
+
+    subparsers.add_parser('runs', parents=[database, dates], help='List the ingested runs.')
+    subparsers.add_parser('serotypes', parents=[database, dates], help='Count and percent of each serotype.')
+    sample = subparsers.add_parser('sample', parents=[database], help='Every report row of a sample across runs.')
+    sample.add_argument('sample',
+        help='Sample id.')
+    coverage = subparsers.add_parser('coverage', parents=[database, dates], help='Median and average coverage per month and group.')
+    coverage.add_argument('--by',
+        choices=['instrument', 'run'],
+        default='instrument',
+        help='Group coverage by sequencer or run (default: instrument).')
+    return parser.parse_args(args)
+
+def connect(db):
+    con = sqlite3.connect(db)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.executescript(SCHEMA)
+    return con
+
+logging.debug("Function for the run date and sequencer of a report, from the options, the run name or the file date")
+def run_details(run, report, run_date=None, instrument=None):
+    match = RUN_NAME_PATTERN.search(run)
+    if run_date is None and match:
+        try:
+            run_date = datetime.datetime.strptime(match.group(1), '%y%m%d').date().isoformat()
+        except ValueError:
+            run_date = None
+    if run_date is None:
+        run_date = datetime.date.fromtimestamp(os.path.getmtime(report)).isoformat()
+    if instrument is None and match:
+        instrument = match.group(2)
+    return run_date, instrument
+
+logging.debug("Function for turning empty and NA report values into NULL")
+def value(text):
+    return None if text is None or text.strip() in ('', 'NA', 'nan') else text
+
+logging.debug("Function for loading one report, the run is replaced in a single transaction so ingesting again gives the same rows")
+def ingest_report(con, report, run_date=None, instrument=None, batch=10000):
+    with open(report, 'r', newline='') as inFile:
+        reader = csv.DictReader(inFile)
+        columns = [column for column in reader.fieldnames if column in SAMPLE_COLUMNS]
+        first = next(reader, None)
+        if first is None:
+            logging.warning(f"No samples in {report}")
+            return 0
+
+        run = first['Run']
+        run_date, instrument = run_details(run, report, run_date, instrument)
+        names = ['run', 'run_date', 'instrument'] + [SAMPLE_COLUMNS[column][0] for column in columns]
+        insert = f"INSERT OR REPLACE INTO samples ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+
+        rows = 0
+        with con:
+            con.execute("DELETE FROM samples WHERE run = ?", (run,))
+            pending = [[run, run_date, instrument] + [value(first.get(column)) for column in columns]]
+            for row in reader:
+                pending.append([run, run_date, instrument] + [value(row.get(column)) for column in columns])
+                if len(pending) >= batch:
+                    con.executemany(insert, pending)
+                    rows += len(pending)
+                    pending = []
+            con.executemany(insert, pending)
+            rows += len(pending)
+
+            con.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (run, run_date, instrument, value(first.get('SPNtypeID Version')), value(first.get('Kraken Database Version')),
+                         rows, os.path.abspath(report), datetime.datetime.now().isoformat(timespec='seconds')))
+
+    logging.info(f"Ingested {rows} samples of run {run}")
+    return rows
+
+logging.debug("Function for the date range part of a query")
+def date_filter(since=None, until=None, column='run_date'):
+    clauses, params = [], []
+    if since:
+        clauses.append(f"{column} >= ?")
+        params.append(since)
+    if until:
+        clauses.append(f"{column} <= ?")
+        params.append(until)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+def query_runs(con, since=None, until=None):
+    where, params = date_filter(since, until)
+    return con.execute(f"SELECT run, run_date, instrument, workflow_version, kraken_db, samples FROM runs{where} ORDER BY run_date, run", params)
+
+def query_serotypes(con, since=None, until=None):
+    where, params = date_filter(since, until)
+    return con.execute(f"""SELECT COALESCE(serotype, 'NA') AS serotype, COUNT(*) AS samples,
+                                  ROUND(100.0 * COUNT(*) / SUM(COUNT(*)) OVER (), 2) AS percent
+                           FROM samples{where} GROUP BY serotype ORDER BY samples DESC, serotype""", params)
+
+def query_sample(con, sample):
+    return con.execute("SELECT * FROM samples WHERE sample = ? ORDER BY run_date, run", (sample,))
+
+def query_coverage(con, by='instrument', since=None, until=None):
+    where, params = date_filter(since, until)
+    return con.execute(f"""SELECT substr(run_date, 1, 7) AS month, {by}, COUNT(*) AS samples,
+                                  ROUND(AVG(median_coverage), 2) AS mean_median_coverage,
+                                  ROUND(AVG(average_coverage), 2) AS mean_average_coverage
+                           FROM samples{where} GROUP BY month, {by} ORDER BY month, {by}""", params)
+
+def write_rows(cursor, outFile=sys.stdout):
+    outFile.write('\t'.join(column[0] for column in cursor.description) + '\n')
+    for row in cursor:
+        outFile.write('\t'.join('' if item is None else str(item) for item in row) + '\n')
+
+def main(args=None):
+    args = parse_args(args)
+
+    con = connect(args.db)
+    if args.command == 'ingest':
+        for report in args.reports:
+            ingest_report(con, report, args.run_date, args.instrument, args.batch)
+    elif args.command == 'runs':
+        write_rows(query_runs(con, args.since, args.until))
+    elif args.command == 'serotypes':
+        write_rows(query_serotypes(con, args.since, args.until))
+    elif args.command == 'sample':
+        write_rows(query_sample(con, args.sample))
+    elif args.command == 'coverage':
+        write_rows(query_coverage(con, args.by, args.since, args.until))
+    con.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
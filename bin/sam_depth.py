@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+from collections import Counter
+
+from compact_depth import write_compact_depth
+from coverage_stats import histogram_median_average
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s : %(message)s')
+
+logging.debug("Same default read filter as samtools depth: unmapped, secondary, qcfail and duplicate")
+EXCLUDE_FLAGS = 0x4 | 0x100 | 0x200 | 0x400
+CIGAR_PATTERN = re.compile(r'(\d+)([MIDNSHP=X])')
+
+def parse_args(args=None):
+    Description='Build per-contig depth and mapping stats from an unsorted SAM stream in one pass.'
+    Epilog='Use with sam_depth.py <SAM file or -> --sample <SAMPLE>'
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument('sam',
+        help='SAM file from bwa mem, or - to read from stdin.')
+    parser.add_argument('--sample',
+        help='Sample id (default: SAM file name up to the first ".").')
+    parser.add_argument('--batch',
+        type=int,
+        default=1000000,
+        help='Number of alignment blocks to buffer before adding to the depth array (default: 1000000).')
+    return parser.parse_args(args)
+
+class DepthAccumulator:
+    """Difference array over all contigs, each contig gets length + 1 slots so ends never spill over."""
+
+    def __init__(self, contigs, lengths, batch=1000000):
+        self.contigs = contigs
+        self.lengths = np.array(lengths, dtype=np.int64)
+        self.slots = np.r_[0, np.cumsum(self.lengths + 1)[:-1]].astype(np.int64) if lengths else np.zeros(0, dtype=np.int64)
+        self.contig_slot = dict(zip(contigs, zip(self.slots.tolist(), lengths)))
+        self.diff = np.zeros(int((self.lengths + 1).sum()) + 1, dtype=np.int64)
+        self.batch = batch
+        self.starts = []
+        self.ends = []
+
+    def add(self, contig, pos, cigar):
+        """Add one alignment, pos is the 1-based leftmost position from the SAM record."""
+        slot, contig_length = self.contig_slot[contig]
+        ref = pos - 1
+        for length, op in CIGAR_PATTERN.findall(cigar):
+            length = int(length)
+            if op in 'M=X':
+                self.starts.append(slot + min(ref, contig_length))
+                self.ends.append(slot + min(ref + length, contig_length))
+                ref += length
+            elif op in 'DN':
+                ref += length
+        if len(self.starts) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if self.starts:
+            self.diff += np.bincount(np.array(self.starts, dtype=np.int64), minlength=len(self.diff))
+            self.diff -= np.bincount(np.array(self.ends, dtype=np.int64), minlength=len(self.diff))
+            self.starts = []
+            self.ends = []
+
+    def depth(self):
+        """Return the concatenated per-position depth and the contig index used by compact_depth.py."""
+        self.flush()
+        depth = np.cumsum(self.diff)
+        keep = np.ones(len(depth), dtype=bool)
+        keep[self.slots + self.lengths] = False
+        keep[-1] = False
+        depth = depth[keep].astype(np.uint32)
+        offsets = np.r_[0, np.cumsum(self.lengths)[:-1]].astype(np.int64) if len(self.lengths) else np.zeros(0, dtype=np.int64)
+        index = pd.DataFrame({'Contig': self.contigs, 'Offset': offsets, 'Length': self.lengths})
+        return depth, index
+
+logging.debug("Function for streaming a SAM file into depth, mapping and insert size stats")
+def stream_sam(handle, batch=1000000):
+
+    contigs = []
+    lengths = []
+    accumulator = None
+    total = 0
+    mapped = 0
+    paired = 0
+    inserts = Counter()
+
+    for line in handle:
+        if line.startswith('@'):
+            if line.startswith('@SQ'):
+                tags = dict(field.split(':', 1) for field in line.rstrip('\n').split('\t')[1:])
+                contigs.append(tags['SN'])
+                lengths.append(int(tags['LN']))
+            continue
+
+        if accumulator is None:
+            accumulator = DepthAccumulator(contigs, lengths, batch)
+
+        fields = line.split('\t', 9)
+        flag = int(fields[1])
+
+        logging.debug("Count each read once, from its primary record")
+        if not flag & 0x900:
+            total += 1
+            if not flag & 0x4:
+                mapped += 1
+            if flag & 0x2:
+                paired += 1
+                tlen = int(fields[8])
+                if tlen > 0:
+                    inserts[tlen] += 1
+
+        if flag & EXCLUDE_FLAGS or fields[5] == '*':
+            continue
+        accumulator.add(fields[2], int(fields[3]), fields[5])
+
+    if accumulator is None:
+        accumulator = DepthAccumulator(contigs, lengths, batch)
+
+    return accumulator, total, mapped, paired, inserts
+
+logging.debug("Function for getting median and mean insert size from the insert size counts")
+def insert_stats(inserts):
+
+    if not inserts:
+        return 'NA', 'NA'
+
+    sizes = np.array(sorted(inserts), dtype=np.int64)
+    return histogram_median_average(np.array([inserts[size] for size in sizes], dtype=np.int64), sizes)
+
+def main(args=None):
+    args = parse_args(args)
+
+    sid = args.sample or os.path.basename(args.sam).split('.')[0]
+    if args.sam == '-' and not args.sample:
+        logging.critical("A sample id (--sample) is required when reading SAM from stdin")
+        sys.exit(1)
+
+    logging.info(f"Streaming alignments for {sid}")
+    if args.sam == '-':
+        accumulator, total, mapped, paired, inserts = stream_sam(sys.stdin, args.batch)
+    else:
+        with open(args.sam, 'r') as inFile:
+            accumulator, total, mapped, paired, inserts = stream_sam(inFile, args.batch)
+
+    logging.info("Writing compact depth")
+    depth, index = accumulator.depth()
+    write_compact_depth(sid, depth, index)
+
+    logging.info("Writing mapping stats")
+    median_insert, mean_insert = insert_stats(inserts)
+    mapping_rate = round(mapped / total * 100, 2) if total else 0.0
+    with open(f'{sid}.mapping_stats.tsv', 'w') as outFile:
+        outFile.write("Sample\tTotal Reads\tMapped Reads\tMapping Rate (%)\tProperly Paired Reads\tMedian Insert Size\tAverage Insert Size\n")
+        outFile.write(f"{sid}\t{total}\t{mapped}\t{mapping_rate}\t{paired}\t{median_insert}\t{mean_insert}\n")
+
+if __name__ == "__main__":
+    sys.exit(main())
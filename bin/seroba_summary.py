@@ -7,6 +7,8 @@ import logging
 
 import pandas as pd
 
+from result_cache import ResultCache
+
 logging.basicConfig(level = logging.INFO, format = '%(levelname)s : %(message)s')
 
 logging.debug("Function for summarizing SeroBA output")
@@ -24,17 +26,22 @@ def summarize_seroba(file):
     df = df.rename(columns={'Contamination_Status':'SeroBA Comments'})
     return df
 
-logging.info("Obtaining all seroba output files")
-files = glob.glob("data*/*.pred.csv")
+def main():
+    logging.info("Obtaining all seroba output files")
+    files = glob.glob("data*/*.pred.csv")
+
+    logging.info("Summarizing seroba output files")
+    cache = ResultCache()
+    dfs = [cache(summarize_seroba, file) for file in files]
+    cache.close()
 
-logging.info("Summarizing seroba output files")
-dfs = map(summarize_seroba,files)
-dfs = list(dfs)
+    logging.debug("Concatenate dfs and write data frame to file")
+    if len(dfs) > 1:
+        dfs_concat = pd.concat(dfs)
+        dfs_concat.to_csv(f'seroba_results.tsv',sep='\t', index=False, header=True, na_rep='NaN')
+    else:
+        dfs = dfs[0]
+        dfs.to_csv(f'seroba_results.tsv',sep='\t', index=False, header=True, na_rep='NaN')
 
-logging.debug("Concatenate dfs and write data frame to file")
-if len(dfs) > 1:
-    dfs_concat = pd.concat(dfs)
-    dfs_concat.to_csv(f'seroba_results.tsv',sep='\t', index=False, header=True, na_rep='NaN')
-else:
-    dfs = dfs[0]
-    dfs.to_csv(f'seroba_results.tsv',sep='\t', index=False, header=True, na_rep='NaN')
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import csv
+import heapq
+import argparse
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+
+from check_samplesheet import count_reads, sniff_format
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s : %(message)s')
+
+def parse_args(args=None):
+    Description='Split a samplesheet into shards with about the same total input, by longest processing time first bin packing. Every shard keeps all NTCs.'
+    Epilog='Use with shard_samplesheet.py <SAMPLESHEET> --shards <N> [--weight bytes|reads] [--ntc_regex <REGEX>]'
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument('samplesheet',
+        help='Samplesheet with sample, fastq_1 and fastq_2 columns.')
+    parser.add_argument('--shards',
+        type=int,
+        required=True,
+        help='Number of shards.')
+    parser.add_argument('--weight',
+        choices=['bytes', 'reads'],
+        default='bytes',
+        help='Balance on the size of the FASTQ files or on their reads. Reads are taken from the reads_1 and reads_2 columns of a samplesheet checked with --read-check count, else they are counted (default: bytes).')
+    parser.add_argument('--ntc_regex',
+        help='Same as the workflow parameter, samples whose name contains a match are NTCs and are put in every shard.')
+    parser.add_argument('--prefix',
+        default='samplesheet',
+        help='Shards are written to <PREFIX>_shard_<N>.csv, with a summary in <PREFIX>_shards.tsv (default: samplesheet).')
+    parser.add_argument('--threads',
+        type=int,
+        default=4,
+        help='Number of FASTQ files counted at the same time with --weight reads (default: 4).')
+    return parser.parse_args(args)
+
+logging.debug("NTCs are found the same way as the workflow, a regex match anywhere in the sample name")
+def is_ntc(sample, ntc_regex):
+    return ntc_regex is not None and re.search(ntc_regex, sample) is not None
+
+def fastqs(row):
+    return [row[column] for column in ('fastq_1', 'fastq_2') if row.get(column)]
+
+logging.debug("Function for the weight of every row, the summed FASTQ size or read count of the pair")
+def row_weights(rows, weight='bytes', threads=4):
+    if weight == 'bytes':
+        return [sum(os.path.getsize(file) for file in fastqs(row)) for row in rows]
+
+    if all(str(row.get(column, '')).isdigit() for row in rows for column in ('reads_1', 'reads_2')):
+        return [int(row['reads_1']) + int(row['reads_2']) for row in rows]
+
+    logging.info("Counting reads, the samplesheet has no read counts")
+    files = sorted({file for row in rows for file in fastqs(row)})
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as pool:
+        reads = {file: count for file, (count, _) in zip(files, pool.map(count_reads, files))}
+    return [sum(reads[file] for file in fastqs(row)) for row in rows]
+
+logging.debug("Function for longest processing time first bin packing, the heaviest sample goes to the lightest shard")
+def pack_shards(weights, shards):
+    """Shard of every row, rows are placed heaviest first and ties go to the lowest shard."""
+    loads = [(0, shard) for shard in range(shards)]
+    assignment = [None] * len(weights)
+    for row in sorted(range(len(weights)), key=lambda row: (-weights[row], row)):
+        load, shard = heapq.heappop(loads)
+        assignment[row] = shard
+        heapq.heappush(loads, (load + weights[row], shard))
+    return assignment
+
+def main(args=None):
+    args = parse_args(args)
+
+    with open(args.samplesheet, 'r', newline='') as inFile:
+        reader = csv.DictReader(inFile, dialect=sniff_format(inFile))
+        header = reader.fieldnames
+        rows = list(reader)
+
+    ntcs = [row for row in rows if is_ntc(row['sample'], args.ntc_regex)]
+    samples = [row for row in rows if not is_ntc(row['sample'], args.ntc_regex)]
+    if not samples:
+        logging.critical(f"No samples to shard in {args.samplesheet}")
+        sys.exit(1)
+    shards = min(max(1, args.shards), len(samples))
+    if shards < args.shards:
+        logging.warning(f"Only {len(samples)} samples, writing {shards} shards")
+
+    try:
+        weights = row_weights(samples, args.weight, args.threads)
+    except OSError as error:
+        logging.critical(f"Could not get the FASTQ {args.weight} of every sample: {error}")
+        sys.exit(1)
+
+    assignment = pack_shards(weights, shards)
+
+    logging.debug("Shards are numbered heaviest first and list their heaviest samples first, so the longest tasks start early")
+    members = [[] for _ in range(shards)]
+    for row in sorted(range(len(samples)), key=lambda row: (-weights[row], row)):
+        members[assignment[row]].append(row)
+    order = sorted(range(shards), key=lambda shard: (-sum(weights[row] for row in members[shard]), shard))
+
+    with open(f'{args.prefix}_shards.tsv', 'w') as summaryFile:
+        summaryFile.write(f"Shard\tSamplesheet\tSamples\tNTCs\tTotal {args.weight.capitalize()}\n")
+        for number, shard in enumerate(order, start=1):
+            file = f'{args.prefix}_shard_{number}.csv'
+            with open(file, 'w', newline='') as outFile:
+                writer = csv.DictWriter(outFile, header, delimiter=',')
+                writer.writeheader()
+                writer.writerows([samples[row] for row in members[shard]] + ntcs)
+            summaryFile.write(f"{number}\t{file}\t{len(members[shard])}\t{len(ntcs)}\t{sum(weights[row] for row in members[shard])}\n")
+
+    total = sum(weights)
+    heaviest = max(sum(weights[row] for row in shard_rows) for shard_rows in members)
+    logging.info(f"Wrote {shards} shards of {len(samples)} samples and {len(ntcs)} NTCs, the heaviest shard has {heaviest / total * 100 if total else 0:.1f}% of the {args.weight}")
+
+if __name__ == "__main__":
+    sys.exit(main())
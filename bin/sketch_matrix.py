@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import glob
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s : %(message)s')
+
+def parse_args(args=None):
+    Description='Compare the k-mer sketches of all samples in a run and flag near-identical or mixed pairs.'
+    Epilog='Use with sketch_matrix.py --identical <MIN_JACCARD> --mixture <MIN_CONTAINMENT>'
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument('--identical',
+        type=float,
+        default=0.95,
+        help='Minimum Jaccard similarity to flag a pair as near-identical (default: 0.95).')
+    parser.add_argument('--mixture',
+        type=float,
+        default=0.98,
+        help='Minimum containment of the smaller sketch in the larger one to flag a possible mixture (default: 0.98).')
+    parser.add_argument('--mixture_size_ratio',
+        type=float,
+        default=1.3,
+        help='Minimum size ratio of the larger to the smaller sketch to flag a possible mixture (default: 1.3).')
+    parser.add_argument('--block',
+        type=int,
+        default=100000,
+        help='Number of shared hashes per incidence matrix slab, memory is about samples x block x 4 bytes (default: 100000).')
+    return parser.parse_args(args)
+
+logging.debug("Function for the sparse sample by hash incidence of the hashes found in more than one sketch, as (row, column) entries sorted by column")
+def incidence_entries(sketches):
+
+    sizes = np.array([len(sketch) for sketch in sketches], dtype=np.int64)
+    if not sizes.sum():
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), 0, sizes
+
+    _, columns, counts = np.unique(np.concatenate(sketches), return_inverse=True, return_counts=True)
+    rows = np.repeat(np.arange(len(sketches)), sizes)
+
+    logging.debug("A hash in only one sketch adds to no pair, so it is left out of the products")
+    shared = counts[columns] > 1
+    rows, columns = rows[shared], columns[shared]
+    kept, columns = np.unique(columns, return_inverse=True)
+    order = np.argsort(columns, kind='stable')
+
+    return rows[order], columns[order], len(kept), sizes
+
+logging.debug("Function for getting all pairwise intersections with matrix products over slabs of hash columns, only one slab is dense at a time")
+def pairwise_intersections(rows, columns, n_columns, sizes, block=100000):
+
+    n = len(sizes)
+    intersections = np.zeros((n, n), dtype=np.int64)
+    for start in range(0, n_columns, block):
+        lo, hi = np.searchsorted(columns, [start, start + block])
+        slab = np.zeros((n, min(block, n_columns - start)), dtype=np.float32)
+        slab[rows[lo:hi], columns[lo:hi] - start] = 1
+        intersections += np.rint(slab @ slab.T).astype(np.int64)
+    np.fill_diagonal(intersections, sizes)
+
+    return intersections
+
+def similarity(intersections, sizes):
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        unions = sizes[:, None] + sizes[None, :] - intersections
+        jaccard = np.where(unions > 0, intersections / unions, 0.0)
+        smaller = np.minimum(sizes[:, None], sizes[None, :])
+        containment = np.where(smaller > 0, intersections / smaller, 0.0)
+
+    return jaccard, containment
+
+logging.debug("Function for flagging near-identical and possibly mixed sample pairs")
+def flag_pairs(samples, sizes, jaccard, containment, identical, mixture, mixture_size_ratio):
+
+    n = len(samples)
+    upper = np.triu(np.ones((n, n), dtype=bool), k=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        size_ratio = np.maximum(sizes[:, None], sizes[None, :]) / np.minimum(sizes[:, None], sizes[None, :])
+
+    near_identical = upper & (jaccard >= identical)
+    mixed = upper & ~near_identical & (containment >= mixture) & (size_ratio >= mixture_size_ratio)
+
+    logging.debug("For a possible mixture the larger sketch contains the smaller one, so the larger sample is flagged")
+    pairs = []
+    flags = {sample: [] for sample in samples}
+    for label, mask in [('Near-identical', near_identical), ('Possible mixture', mixed)]:
+        for i, j in zip(*np.nonzero(mask)):
+            pairs.append([samples[i], samples[j], label, round(float(jaccard[i, j]), 4), round(float(containment[i, j]), 4)])
+            if label == 'Near-identical':
+                flags[samples[i]].append(f"Near-identical to {samples[j]}")
+                flags[samples[j]].append(f"Near-identical to {samples[i]}")
+            else:
+                larger, smaller = (i, j) if sizes[i] > sizes[j] else (j, i)
+                flags[samples[larger]].append(f"Possible mixture containing {samples[smaller]}")
+
+    pairs_df = pd.DataFrame(pairs, columns=['Sample 1','Sample 2','Flag','Jaccard','Containment'])
+    flags_df = pd.DataFrame([[sample, ';'.join(flags[sample])] for sample in samples], columns=['Sample','Sketch Comparison Flags'])
+
+    return pairs_df, flags_df
+
+def main(args=None):
+    args = parse_args(args)
+
+    logging.info("Obtaining all k-mer sketches")
+    files = sorted(glob.glob("data*/*.kmer_sketch.npy"))
+    samples = [os.path.basename(file).split('.')[0] for file in files]
+    sketches = [np.load(file) for file in files]
+
+    logging.info(f"Comparing {len(samples)} sketches")
+    rows, columns, n_columns, sizes = incidence_entries(sketches)
+    intersections = pairwise_intersections(rows, columns, n_columns, sizes, args.block)
+    jaccard, containment = similarity(intersections, sizes)
+
+    logging.info("Writing similarity matrix and flagged pairs")
+    pd.DataFrame(np.round(jaccard, 4), index=samples, columns=samples).to_csv('sketch_similarity_matrix.tsv', sep='\t', index_label='Sample')
+    pairs_df, flags_df = flag_pairs(samples, sizes, jaccard, containment, args.identical, args.mixture, args.mixture_size_ratio)
+    pairs_df.to_csv('sketch_flagged_pairs.tsv', sep='\t', index=False, header=True)
+    flags_df.to_csv('sketch_flags.tsv', sep='\t', index=False, header=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,20 @@
+process COMPACT_DEPTH {
+    label 'process_single'
+
+    container "quay.io/wslh-bioinformatics/pandas@sha256:bf3cb8e5f695cc7c4cf8cc5ab7e7924d1fc4c40dfbe7cb907110e93a7bf6f101"
+
+    input:
+    path(depth_file)
+
+    output:
+    path("*.depth.npy")         , emit: depth_npy
+    path("*.depth.index.tsv")   , emit: depth_index
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    """
+    compact_depth.py ${depth_file}
+    """
+}
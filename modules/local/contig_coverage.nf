@@ -0,0 +1,21 @@
+process CONTIG_COVERAGE {
+    label 'process_single'
+
+    container "quay.io/wslh-bioinformatics/pandas@sha256:bf3cb8e5f695cc7c4cf8cc5ab7e7924d1fc4c40dfbe7cb907110e93a7bf6f101"
+
+    input:
+    path("data/*")
+    val coverage_window
+
+    output:
+    path('contig_coverage.tsv')     , emit: contig_tsv
+    path('coverage_uniformity.tsv') , emit: uniformity_tsv
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    """
+    contig_coverage.py --window ${coverage_window}
+    """
+}
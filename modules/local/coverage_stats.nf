@@ -14,7 +14,8 @@ process COVERAGE_STATS {
     task.ext.when == null || task.ext.when
 
     script:
+    def args = task.ext.args ?: ''
     """
-    coverage_stats.py ${mincoverage}
+    coverage_stats.py ${mincoverage} $args
     """
 }
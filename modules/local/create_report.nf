@@ -1,5 +1,5 @@
 process CREATE_REPORT {
-    label 'process_single'
+    label 'process_low'
 
     container "quay.io/wslh-bioinformatics/pandas@sha256:bf3cb8e5f695cc7c4cf8cc5ab7e7924d1fc4c40dfbe7cb907110e93a7bf6f101"
 
@@ -9,17 +9,21 @@ process CREATE_REPORT {
     val runname
 
     output:
-    path('*_spntypeid_report.csv')   , emit: result_csv
+    path('*_spntypeid_report.csv')   , optional: true, emit: result_csv
+    path('*_spntypeid_report.ndjson'), optional: true, emit: result_tables
 
     when:
     task.ext.when == null || task.ext.when
 
     script:
+    def args = task.ext.args ?: ''
     """
     create_report.py \
         --result_files ${results_compiled} \
         --workflowVersion ${workflow.manifest.version} \
         --workflowRunName ${runname} \
-        --empty_ntc_list ${empty_ntc}
+        --empty_ntc_list ${empty_ntc} \
+        --threads ${task.cpus} \
+        $args
     """
 }
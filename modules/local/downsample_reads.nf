@@ -0,0 +1,31 @@
+process DOWNSAMPLE_READS {
+    tag "$meta.id"
+    label 'process_single'
+
+    container "quay.io/wslh-bioinformatics/pandas@sha256:bf3cb8e5f695cc7c4cf8cc5ab7e7924d1fc4c40dfbe7cb907110e93a7bf6f101"
+
+    input:
+    tuple val(meta), path(reads), path(bbduk_log)
+    path NCBI_assembly_stats_file
+    val max_coverage
+
+    output:
+    tuple val(meta), path("*_downsampled_{1,2}.fastq.gz")   , emit: reads
+    path("*.downsample.tsv")                                , emit: downsample_stats
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args = task.ext.args ?: ''
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    downsample_reads.py \\
+        ${reads[0]} ${reads[1]} \\
+        --sample ${prefix} \\
+        -d ${NCBI_assembly_stats_file} \\
+        --trim_stats ${bbduk_log} \\
+        --max_coverage ${max_coverage} \\
+        $args
+    """
+}
@@ -0,0 +1,29 @@
+process FASTQ_FINGERPRINT {
+    tag "$meta.id"
+    label 'process_single'
+
+    container "quay.io/wslh-bioinformatics/pandas@sha256:bf3cb8e5f695cc7c4cf8cc5ab7e7924d1fc4c40dfbe7cb907110e93a7bf6f101"
+
+    input:
+    tuple val(meta), path(reads)
+    path history_db
+
+    output:
+    tuple val(meta), path(reads), env(PRIOR)    , emit: reads
+    path("*.fingerprint.tsv")                   , emit: fingerprint
+    path("*.prior_row.csv")                     , optional: true, emit: prior_row
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args = task.ext.args ?: ''
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    PRIOR=\$(fastq_fingerprint.py lookup \\
+        $args \\
+        --db ${history_db} \\
+        --sample ${prefix} \\
+        ${reads[0]} ${reads[1]})
+    """
+}
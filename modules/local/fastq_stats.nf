@@ -0,0 +1,22 @@
+process FASTQ_STATS {
+    tag "$meta.id"
+    label 'process_single'
+
+    container "quay.io/wslh-bioinformatics/pandas@sha256:bf3cb8e5f695cc7c4cf8cc5ab7e7924d1fc4c40dfbe7cb907110e93a7bf6f101"
+
+    input:
+    tuple val(meta), path(reads)
+
+    output:
+    path("*.fastq_stats.npz")                   , emit: qual_results
+    tuple val(meta), path("*.fastq_stats.npz")  , emit: sample_stats
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    fastq_stats.py ${reads[0]} ${reads[1]} --sample ${prefix}
+    """
+}
@@ -0,0 +1,28 @@
+process KMER_SKETCH {
+    tag "$meta.id"
+    label 'process_single'
+
+    container "quay.io/wslh-bioinformatics/pandas@sha256:bf3cb8e5f695cc7c4cf8cc5ab7e7924d1fc4c40dfbe7cb907110e93a7bf6f101"
+
+    input:
+    tuple val(meta), path(reads)
+    path NCBI_assembly_stats_file
+
+    output:
+    path("*.kmer_stats.tsv")    , emit: kmer_stats
+    path("*.kmer_sketch.npy")   , emit: kmer_sketch
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args = task.ext.args ?: ''
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    kmer_sketch.py \\
+        ${reads[0]} ${reads[1]} \\
+        --sample ${prefix} \\
+        -d ${NCBI_assembly_stats_file} \\
+        $args
+    """
+}
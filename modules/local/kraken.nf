@@ -2,10 +2,11 @@ process KRAKEN {
     tag "$meta.id"
     label 'process_medium'
 
-    container "quay.io/wslh-bioinformatics/kraken@sha256:96ba57017a2b5495d553b177ed47a3c85b5bf79392e4e8335e7cd79cdd57917c"
+    container "${ params.kraken2_db ? params.kraken2_container : 'quay.io/wslh-bioinformatics/kraken@sha256:96ba57017a2b5495d553b177ed47a3c85b5bf79392e4e8335e7cd79cdd57917c' }"
 
     input:
     tuple val(meta), path(reads)
+    path kraken2_db
 
     output:
     path("${meta.id}.kraken.txt")   , emit: kraken_results
@@ -18,6 +19,18 @@ process KRAKEN {
     script:
     def args = task.ext.args ?: ''
     def prefix = task.ext.prefix ?: "${meta.id}"
+    if (kraken2_db) {
+    """
+    kraken2 $args --db ${kraken2_db} --threads ${task.cpus} --paired --report ${prefix}.kraken.txt --output ${prefix}_raw.txt ${reads[0]} ${reads[1]} 2> kraken.log
+    find -name kraken.log -size 0 -exec rm {} +
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        kraken2: \$(echo \$(kraken2 --version 2>&1) | sed 's/^.*Kraken version //; s/ .*\$//')
+        kraken2 DB: ${kraken2_db.name}
+    END_VERSIONS
+    """
+    } else {
     """
     kraken $args --db /kraken-database/minikraken_20171013_4GB --threads ${task.cpus} --paired ${reads[0]} ${reads[1]} > ${prefix}_raw.txt 2> kraken.log
     kraken-report --db /kraken-database/minikraken_20171013_4GB ${prefix}_raw.txt > ${prefix}.kraken.txt 2> kraken.log
@@ -29,4 +42,5 @@ process KRAKEN {
         kraken DB: \$(echo \$(ls /kraken-database/) )
     END_VERSIONS
     """
+    }
 }
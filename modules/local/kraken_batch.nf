@@ -0,0 +1,51 @@
+process KRAKEN_BATCH {
+    tag "${metas.size()} samples"
+    label 'process_medium'
+
+    container "quay.io/wslh-bioinformatics/kraken@sha256:96ba57017a2b5495d553b177ed47a3c85b5bf79392e4e8335e7cd79cdd57917c"
+
+    input:
+    tuple val(metas), path(reads, stageAs: 'reads?/*')
+
+    output:
+    tuple path("batch_raw.txt"), path("manifest.tsv"), path("taxonomy"), emit: batch
+    path("kraken.log")              , optional: true, emit: log
+    path "versions.yml"             , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args = task.ext.args ?: ''
+    def manifest = metas.withIndex().collect{ meta, i -> "'${meta.id}\\t${reads[2 * i]}\\t${reads[2 * i + 1]}'" }.join(' ')
+    """
+    printf '%b\\n' ${manifest} > manifest.tsv
+
+    # Tag read names with the sample index so the classified reads can be split by sample,
+    # the tagged reads are kept gzip compressed so the batch takes about as much space as its input
+    tag_reads() {
+        index=0
+        for fastq in \$(cut -f\$1 manifest.tsv); do
+            zcat -f \$fastq | awk -v tag=\$index 'NR % 4 == 1 { \$0 = "@" tag "|" substr(\$0, 2) } 1'
+            index=\$((index + 1))
+        done | gzip -1
+    }
+    tag_reads 2 > batch_1.fastq.gz
+    tag_reads 3 > batch_2.fastq.gz
+
+    kraken $args --db /kraken-database/minikraken_20171013_4GB --threads ${task.cpus} --fastq-input --gzip-compressed --paired batch_1.fastq.gz batch_2.fastq.gz > batch_raw.txt 2> kraken.log
+    rm batch_1.fastq.gz batch_2.fastq.gz
+    find -name kraken.log -size 0 -exec rm {} +
+
+    # Keep only the taxonomy columns needed to rebuild the reports
+    mkdir taxonomy
+    cut -f1,3,5 /kraken-database/minikraken_20171013_4GB/taxonomy/nodes.dmp > taxonomy/nodes.tsv
+    grep 'scientific name' /kraken-database/minikraken_20171013_4GB/taxonomy/names.dmp | cut -f1,3 > taxonomy/names.tsv
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        kraken: \$(echo \$(kraken --version 2>&1) | sed 's/^.*Kraken //')
+        kraken DB: \$(echo \$(ls /kraken-database/) )
+    END_VERSIONS
+    """
+}
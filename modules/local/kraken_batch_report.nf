@@ -0,0 +1,23 @@
+process KRAKEN_BATCH_REPORT {
+    label 'process_single'
+
+    container "quay.io/wslh-bioinformatics/pandas@sha256:bf3cb8e5f695cc7c4cf8cc5ab7e7924d1fc4c40dfbe7cb907110e93a7bf6f101"
+
+    input:
+    tuple path(kraken_output), path(manifest), path(taxonomy)
+
+    output:
+    path("*.kraken.txt")    , emit: kraken_results
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    """
+    kraken_batch_report.py \\
+        ${kraken_output} \\
+        --manifest ${manifest} \\
+        --nodes ${taxonomy}/nodes.tsv \\
+        --names ${taxonomy}/names.tsv
+    """
+}
@@ -7,10 +7,12 @@ process KRAKEN_SUMMARY {
     path("data/*")
 
     output:
-    path("kraken_results.tsv"), emit: kraken_tsv
+    path("kraken_results.tsv")  , emit: kraken_tsv
+    path("data/*.kraken.npz")   , emit: kraken_store
 
     script:
+    def args = task.ext.args ?: ''
     """
-    kraken_summary.py
+    kraken_summary.py $args
     """
 }
@@ -0,0 +1,28 @@
+process MINHASH_SCREEN {
+    tag "$meta.id"
+    label 'process_single'
+
+    container "quay.io/wslh-bioinformatics/pandas@sha256:bf3cb8e5f695cc7c4cf8cc5ab7e7924d1fc4c40dfbe7cb907110e93a7bf6f101"
+
+    input:
+    tuple val(meta), path(reads)
+    path sketches
+    val min_containment
+
+    output:
+    tuple val(meta), path(reads), env(PASS)     , emit: reads
+    path("*.minhash_screen.tsv")                , emit: screen_results
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    PASS=\$(minhash_screen.py screen \\
+        ${reads[0]} ${reads[1]} \\
+        --sketches ${sketches} \\
+        --sample ${prefix} \\
+        --min_containment ${min_containment})
+    """
+}
@@ -0,0 +1,32 @@
+process QC_GATE {
+    tag "$meta.id"
+    label 'process_single'
+
+    container "quay.io/wslh-bioinformatics/pandas@sha256:bf3cb8e5f695cc7c4cf8cc5ab7e7924d1fc4c40dfbe7cb907110e93a7bf6f101"
+
+    input:
+    tuple val(meta), path(fastq_stats)
+    path NCBI_assembly_stats_file
+    val minavgreadq
+    val mincoverage
+
+    output:
+    tuple val(meta), env(PASS)  , emit: gate
+    path("*.qc_gate.tsv")       , emit: gate_results
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args = task.ext.args ?: ''
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    PASS=\$(qc_gate.py \\
+        ${fastq_stats} \\
+        --sample ${prefix} \\
+        -d ${NCBI_assembly_stats_file} \\
+        --minavgreadq ${minavgreadq} \\
+        --mincoverage ${mincoverage} \\
+        $args)
+    """
+}
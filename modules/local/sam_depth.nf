@@ -0,0 +1,23 @@
+process SAM_DEPTH {
+    tag "$meta.id"
+    label 'process_single'
+
+    container "quay.io/wslh-bioinformatics/pandas@sha256:bf3cb8e5f695cc7c4cf8cc5ab7e7924d1fc4c40dfbe7cb907110e93a7bf6f101"
+
+    input:
+    tuple val(meta), path(sam_file)
+
+    output:
+    path("*.depth.npy")         , emit: depth_npy
+    path("*.depth.index.tsv")   , emit: depth_index
+    path("*.mapping_stats.tsv") , emit: mapping_stats
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    """
+    sam_depth.py ${sam_file} --sample ${prefix}
+    """
+}
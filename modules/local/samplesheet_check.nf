@@ -1,20 +1,27 @@
 process SAMPLESHEET_CHECK {
     tag "$samplesheet"
+    label 'process_low'
 
     container "quay.io/wslh-bioinformatics/python@sha256:25b8870fe464a57948723fdc7e8887c003472e2b403997a8da8fdfd1d09b87b1"
 
     input:
     path samplesheet
+    path fastqs, stageAs: 'fastq_?.gz'
 
     output:
     path '*.csv'       , emit: csv
     path "versions.yml", emit: versions
 
     script: // This script is bundled with the pipeline, in nf-core/spntypeid/bin/
+    def args = task.ext.args ?: ''
+    def staged = fastqs ? "--staged ${fastqs.join(' ')}" : ''
     """
     check_samplesheet.py \\
         ${samplesheet} \\
-        samplesheet.valid.csv
+        samplesheet.valid.csv \\
+        --threads ${task.cpus} \\
+        $args \\
+        $staged
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
@@ -8,7 +8,7 @@ process SAMTOOLS {
     tuple val(meta), path(sam_files)
 
     output:
-    path("*.depth.tsv")     , emit: cov_files
+    path("*.depth.tsv.gz")  , emit: cov_files
     path("*.stats.txt")     , emit: stats_multiqc
     path("*.bam")           , emit: sorted_bam
     path "versions.yml"     , emit: versions
@@ -23,7 +23,7 @@ process SAMTOOLS {
     """
     samtools view -S -b ${prefix}.sam | samtools sort > ${prefix}.bam
     samtools index ${prefix}.bam
-    samtools depth -a ${prefix}.bam > ${prefix}.depth.tsv
+    samtools depth -a ${prefix}.bam | gzip > ${prefix}.depth.tsv.gz
     samtools stats ${prefix}.bam > ${prefix}.stats.txt
 
     cat <<-END_VERSIONS > versions.yml
@@ -6,10 +6,11 @@ process SHOVILL {
 
     input:
     tuple val(meta), path(reads)
+    val map_reads
 
     output:
     tuple val(meta), path("${meta.id}.contigs.fa")                              , emit: contigs
-    tuple val(meta), path("${meta.id}.sam")                                     , emit: sam_files
+    tuple val(meta), path("${meta.id}.sam")                                     , optional:true, emit: sam_files
     tuple val(meta), path("*_shovill_output/shovill.corrections")                 , emit: corrections
     tuple val(meta), path("*_shovill_output/shovill.log")                         , emit: log
     tuple val(meta), path("*_shovill_output/{skesa,spades,megahit,velvet}.fasta") , emit: raw_contigs
@@ -23,6 +24,7 @@ process SHOVILL {
     def args = task.ext.args ?: ''
     def prefix = task.ext.prefix ?: "${meta.id}"
     def memory = task.memory.toGiga()
+    def map_command = map_reads ? "bwa index ${prefix}.contigs.fa && bwa mem ${prefix}.contigs.fa ${reads[0]} ${reads[1]} > ${prefix}.sam" : ''
     """
     shovill \\
         --R1 ${reads[0]} \\
@@ -34,8 +36,7 @@ process SHOVILL {
         --force
 
     mv ${prefix}_shovill_output/contigs.fa ${prefix}.contigs.fa
-    bwa index ${prefix}.contigs.fa
-    bwa mem ${prefix}.contigs.fa ${reads[0]} ${reads[1]} > ${prefix}.sam
+    $map_command
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
@@ -0,0 +1,22 @@
+process SKETCH_MATRIX {
+    label 'process_single'
+
+    container "quay.io/wslh-bioinformatics/pandas@sha256:bf3cb8e5f695cc7c4cf8cc5ab7e7924d1fc4c40dfbe7cb907110e93a7bf6f101"
+
+    input:
+    path("data/*")
+
+    output:
+    path('sketch_similarity_matrix.tsv')    , emit: matrix_tsv
+    path('sketch_flagged_pairs.tsv')        , emit: pairs_tsv
+    path('sketch_flags.tsv')                , emit: flags_tsv
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args = task.ext.args ?: ''
+    """
+    sketch_matrix.py $args
+    """
+}
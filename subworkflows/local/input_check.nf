@@ -9,7 +9,17 @@ workflow INPUT_CHECK {
     samplesheet // file: /path/to/samplesheet.csv
 
     main:
-    SAMPLESHEET_CHECK ( samplesheet )
+    // Stage the FASTQ files in samplesheet order so remote and relative paths can be read.
+    // check_samplesheet.py also accepts TSV samplesheets, so split on the separator of the header.
+    def sep = file(samplesheet).withReader { it.readLine() }?.contains('\t') ? '\t' : ','
+    Channel.fromPath( samplesheet )
+        .splitCsv ( header:true, sep:sep )
+        .flatMap { row -> [ row.fastq_1, row.fastq_2 ].findAll { it } }
+        .map { file(it, checkIfExists: true) }
+        .toList()
+        .set { fastqs }
+
+    SAMPLESHEET_CHECK ( samplesheet, fastqs )
         .csv
         .splitCsv ( header:true, sep:',' )
         .map { create_fastq_channel(it) }
@@ -26,6 +36,7 @@ def create_fastq_channel(LinkedHashMap row) {
     def meta = [:]
     meta.id         = row.sample
     meta.single_end = row.single_end.toBoolean()
+    meta.read_status = row.read_status ?: 'pass'
 
     // add path(s) of the fastq file(s) to the meta map
     def fastq_meta = []
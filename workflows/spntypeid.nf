@@ -12,6 +12,7 @@ for (param in checkPathParamList) { if (param) { file(param, checkIfExists: true
 
 // Check mandatory parameters
 if (params.input) { ch_input = file(params.input) } else { exit 1, 'Input samplesheet not specified!' }
+if (params.kraken2_db && !params.kraken2_container) { exit 1, 'Kraken2 container not specified, give --kraken2_container as an image pinned by @sha256 digest!' }
 
 /*
 ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -47,17 +48,28 @@ include { INPUT_CHECK } from '../subworkflows/local/input_check'
 
 include { BBDUK                         } from '../modules/local/bbduk'
 include { BBDUK_SUMMARY                 } from '../modules/local/bbduk_summary'
+include { DOWNSAMPLE_READS              } from '../modules/local/downsample_reads'
 include { FASTQC                        } from '../modules/local/fastqc'
+include { KMER_SKETCH                   } from '../modules/local/kmer_sketch'
+include { SKETCH_MATRIX                 } from '../modules/local/sketch_matrix'
 include { FASTQC_SUMMARY                } from '../modules/local/fastqc_summary'
 include { SHOVILL                       } from '../modules/local/shovill'
 include { SAMTOOLS                      } from '../modules/local/samtools'
+include { SAM_DEPTH                     } from '../modules/local/sam_depth'
 include { COVERAGE_STATS                } from '../modules/local/coverage_stats'
+include { COMPACT_DEPTH                 } from '../modules/local/compact_depth'
+include { CONTIG_COVERAGE               } from '../modules/local/contig_coverage'
 include { QUAST                         } from '../modules/local/quast'
 include { QUAST_SUMMARY                 } from '../modules/local/quast_summary'
-include { BIOAWK                        } from '../modules/local/bioawk'
+include { FASTQ_STATS                   } from '../modules/local/fastq_stats'
 include { QUALITY_STATS                 } from '../modules/local/quality_stats'
+include { QC_GATE                       } from '../modules/local/qc_gate'
+include { MINHASH_SCREEN                } from '../modules/local/minhash_screen'
+include { FASTQ_FINGERPRINT             } from '../modules/local/fastq_fingerprint'
 include { KRAKEN as KRAKEN_SAMPLE       } from '../modules/local/kraken'
 include { KRAKEN as KRAKEN_NTC          } from '../modules/local/kraken'
+include { KRAKEN_BATCH                  } from '../modules/local/kraken_batch'
+include { KRAKEN_BATCH_REPORT           } from '../modules/local/kraken_batch_report'
 include { KRAKEN_SUMMARY                } from '../modules/local/kraken_summary'
 include { SEROBA                        } from '../modules/local/seroba'
 include { SEROBA_SUMMARY                } from '../modules/local/seroba_summary'
@@ -98,22 +110,18 @@ workflow SPNTYPEID {
         .set{ ch_filtered }
 
     ch_filtered.paired_end
-        .map{ meta, file ->
-            [meta, file, file[0].countFastq(), file[1].countFastq()]}
-        .branch{ meta, file, count1, count2 ->
-            pass: count1 > 0 && count2 > 0
-            fail: count1 == 0 || count2 == 0 || count1 == 0 && count2 == 0
+        .branch{ meta, file ->
+            pass: meta.read_status == 'pass'
+            fail: meta.read_status == 'empty'
+            invalid: true
         }
         .set{ ch_paired_end }
 
     ch_paired_end.pass
-        .map { meta, file, count1, count2 -> 
-            [meta, file]
-            }
         .set{ ch_filtered }
 
     ch_paired_end.fail
-        .map { meta, file, count1, count2 ->
+        .map { meta, file ->
             [meta.id]
             }
         .set{ ch_paired_end_fail }
@@ -129,6 +137,16 @@ workflow SPNTYPEID {
             newLine: true
         )
 
+    ch_paired_end.invalid
+        .map { meta, file ->
+            "${meta.id},${meta.read_status}"
+            }
+        .collectFile(
+            storeDir: "${params.outdir}/rejected_samples",
+            name: 'Invalid_fastq_samples.csv',
+            newLine: true
+        )
+
     ch_filtered
         .branch {
             ntc: !!(it[0]['id'] =~ params.ntc_regex)
@@ -136,9 +154,46 @@ workflow SPNTYPEID {
         }
         .set{ ch_input_reads }
 
+    ch_sample_reads = ch_input_reads.sample
+    ch_prior_rows   = Channel.empty()
+    if (params.fingerprint_db != null) {
+        //
+        // MODULE: FASTQ_FINGERPRINT
+        //
+        FASTQ_FINGERPRINT (
+            ch_input_reads.sample,
+            file(params.fingerprint_db, checkIfExists: true)
+        )
+
+        FASTQ_FINGERPRINT.out.fingerprint
+            .collectFile(
+                storeDir: "${params.outdir}/fastq_fingerprint",
+                name: 'fingerprints.tsv',
+                keepHeader: true
+            )
+
+        if (params.skip_resubmitted) {
+            FASTQ_FINGERPRINT.out.reads
+                .branch{ meta, reads, prior ->
+                    new_sample: prior == ''
+                    resubmitted: true
+                }
+                .set{ ch_fingerprinted }
+
+            ch_sample_reads = ch_fingerprinted.new_sample.map{ meta, reads, prior -> [meta, reads] }
+
+            ch_prior_rows = FASTQ_FINGERPRINT.out.prior_row
+                .collectFile(
+                    storeDir: "${params.outdir}/fastq_fingerprint",
+                    name: 'prior_rows.csv',
+                    keepHeader: true
+                )
+        }
+    }
+
     if (params.ntc_regex != null) {
         ch_paired_end.fail
-            .map { meta, file, count1, count2 ->
+            .map { meta, file ->
                 [meta.id]
                 }
             .set{ ch_ntc_check }
@@ -162,7 +217,7 @@ workflow SPNTYPEID {
     // MODULE: BBDUK
     //
     BBDUK (
-        ch_input_reads.sample,
+        ch_sample_reads,
         params.contaminants
     )
     ch_versions = ch_versions.mix(BBDUK.out.versions.first())
@@ -174,11 +229,59 @@ workflow SPNTYPEID {
         BBDUK.out.bbduk_trim.collect()
     )
 
+    ch_clean_reads  = BBDUK.out.reads
+    ch_seroba_reads = ch_sample_reads
+    if (params.max_coverage != null) {
+        //
+        // MODULE: DOWNSAMPLE_READS
+        //
+        DOWNSAMPLE_READS (
+            BBDUK.out.reads.join(BBDUK.out.log),
+            params.ncbi_assembly_stats,
+            params.max_coverage
+        )
+
+        DOWNSAMPLE_READS.out.downsample_stats
+            .collectFile(
+                storeDir: "${params.outdir}/downsample_reads",
+                name: 'downsample_summary.tsv',
+                keepHeader: true
+            )
+
+        ch_clean_reads  = DOWNSAMPLE_READS.out.reads
+    }
+
+    ch_sketch_flags = Channel.empty()
+    if (params.kmer_sketch) {
+        //
+        // MODULE: KMER_SKETCH
+        //
+        KMER_SKETCH (
+            ch_clean_reads,
+            params.ncbi_assembly_stats
+        )
+
+        KMER_SKETCH.out.kmer_stats
+            .collectFile(
+                storeDir: "${params.outdir}/kmer_sketch",
+                name: 'kmer_stats_summary.tsv',
+                keepHeader: true
+            )
+
+        //
+        // MODULE: SKETCH_MATRIX
+        //
+        SKETCH_MATRIX (
+            KMER_SKETCH.out.kmer_sketch.collect()
+        )
+        ch_sketch_flags = SKETCH_MATRIX.out.flags_tsv
+    }
+
     //
     // MODULE: FASTQC
     //
     FASTQC (
-        BBDUK.out.reads
+        ch_clean_reads
     )
     ch_versions = ch_versions.mix(FASTQC.out.versions.first())
 
@@ -190,29 +293,105 @@ workflow SPNTYPEID {
     )
 
     //
-    // MODULE: SHOVILL
+    // MODULE: FASTQ_STATS
     //
-    SHOVILL (
-        BBDUK.out.reads
+    FASTQ_STATS (
+        ch_sample_reads
     )
-    ch_versions = ch_versions.mix(SHOVILL.out.versions.first())
+
+    ch_gate_results = Channel.empty()
+    if (params.qc_gate) {
+        //
+        // MODULE: QC_GATE
+        //
+        QC_GATE (
+            FASTQ_STATS.out.sample_stats,
+            params.ncbi_assembly_stats,
+            params.minavgreadq,
+            params.mincoverage
+        )
+
+        QC_GATE.out.gate_results
+            .collectFile(
+                storeDir: "${params.outdir}/qc_gate",
+                name: 'qc_gate_summary.tsv',
+                keepHeader: true
+            )
+            .set{ ch_gate_results }
+
+        QC_GATE.out.gate
+            .filter{ meta, pass -> pass == 'True' }
+            .set{ ch_gate_pass }
+
+        ch_clean_reads  = ch_clean_reads.join(ch_gate_pass).map{ meta, reads, pass -> [meta, reads] }
+        ch_seroba_reads = ch_seroba_reads.join(ch_gate_pass).map{ meta, reads, pass -> [meta, reads] }
+    }
 
     //
-    // MODULE: SAMTOOLS
+    // MODULE: SHOVILL
     //
-    SAMTOOLS (
-        SHOVILL.out.sam_files
+    SHOVILL (
+        ch_clean_reads,
+        params.coverage_mode != 'contigs'
     )
-    ch_versions = ch_versions.mix(SAMTOOLS.out.versions.first())
+    ch_versions = ch_versions.mix(SHOVILL.out.versions.first())
+
+    ch_depth_npy      = Channel.empty()
+    ch_depth_index    = Channel.empty()
+    ch_samtools_stats = Channel.empty()
+    if (params.coverage_mode == 'contigs') {
+        ch_cov_files      = SHOVILL.out.contigs.map{ meta, contigs -> contigs }
+    } else if (params.coverage_mode == 'stream') {
+        //
+        // MODULE: SAM_DEPTH
+        //
+        SAM_DEPTH (
+            SHOVILL.out.sam_files
+        )
+
+        ch_cov_files      = SAM_DEPTH.out.depth_npy
+        ch_depth_npy      = SAM_DEPTH.out.depth_npy
+        ch_depth_index    = SAM_DEPTH.out.depth_index
+    } else {
+        //
+        // MODULE: SAMTOOLS
+        //
+        SAMTOOLS (
+            SHOVILL.out.sam_files
+        )
+        ch_versions = ch_versions.mix(SAMTOOLS.out.versions.first())
+
+        //
+        // MODULE: COMPACT_DEPTH
+        //
+        COMPACT_DEPTH (
+            SAMTOOLS.out.cov_files
+        )
+
+        ch_cov_files      = SAMTOOLS.out.cov_files
+        ch_depth_npy      = COMPACT_DEPTH.out.depth_npy
+        ch_depth_index    = COMPACT_DEPTH.out.depth_index
+        ch_samtools_stats = SAMTOOLS.out.stats_multiqc
+    }
 
     //
     // MODULE: COVERAGE_STATS
     //
     COVERAGE_STATS (
-        SAMTOOLS.out.cov_files.collect(),
+        ch_cov_files.collect(),
         params.mincoverage
     )
 
+    if (params.coverage_mode != 'contigs') {
+        //
+        // MODULE: CONTIG_COVERAGE
+        //
+        CONTIG_COVERAGE (
+            ch_depth_npy.mix(ch_depth_index).collect(),
+            params.coverage_window
+        )
+    }
+
     //
     // MODULE: QUAST
     //
@@ -238,35 +417,89 @@ workflow SPNTYPEID {
         params.maxcontigs
     )
 
-    //
-    // MODULE: BIOAWK
-    //
-    BIOAWK (
-        ch_input_reads.sample
-    )
-    ch_versions = ch_versions.mix(BIOAWK.out.versions.first())
-
     //
     // MODULE: QUALITY_STATS
     //
     QUALITY_STATS (
-        BIOAWK.out.qual_results.collect(),
+        FASTQ_STATS.out.qual_results.collect(),
         params.minavgreadq
     )
 
-    //
-    // MODULE: KRAKEN_SAMPLE
-    //
-    KRAKEN_SAMPLE (
-        ch_input_reads.sample
-    )
-    ch_versions = ch_versions.mix(KRAKEN_SAMPLE.out.versions.first())
+    if (params.spn_sketch != null) {
+        //
+        // MODULE: MINHASH_SCREEN
+        //
+        MINHASH_SCREEN (
+            ch_sample_reads,
+            params.spn_sketch.tokenize(',').collect{ file(it, checkIfExists: true) },
+            params.min_sketch_containment
+        )
+
+        MINHASH_SCREEN.out.screen_results
+            .collectFile(
+                storeDir: "${params.outdir}/minhash_screen",
+                name: 'minhash_screen_summary.tsv',
+                keepHeader: true
+            )
+
+        MINHASH_SCREEN.out.reads
+            .branch{ meta, reads, pass ->
+                pass: pass == 'True'
+                fail: true
+            }
+            .set{ ch_screened }
+
+        ch_screened.fail
+            .map{ meta, reads, pass -> meta.id }
+            .collectFile(
+                storeDir: "${params.outdir}/rejected_samples",
+                name: 'MinHash_screen_failed.csv',
+                newLine: true
+            )
+
+        ch_kraken_reads = ch_screened.pass.map{ meta, reads, pass -> [meta, reads] }
+    } else {
+        ch_kraken_reads = ch_sample_reads
+    }
+
+    if (params.kraken_batch_size != null && !params.kraken2_db) {
+        //
+        // MODULE: KRAKEN_BATCH
+        //
+        KRAKEN_BATCH (
+            ch_kraken_reads
+                .collate(params.kraken_batch_size)
+                .map{ batch -> [batch.collect{ it[0] }, batch.collect{ it[1] }.flatten()] }
+        )
+
+        //
+        // MODULE: KRAKEN_BATCH_REPORT
+        //
+        KRAKEN_BATCH_REPORT (
+            KRAKEN_BATCH.out.batch
+        )
+
+        ch_kraken_results  = KRAKEN_BATCH_REPORT.out.kraken_results.flatten()
+        ch_kraken_versions = KRAKEN_BATCH.out.versions
+    } else {
+        //
+        // MODULE: KRAKEN_SAMPLE
+        //
+        KRAKEN_SAMPLE (
+            ch_kraken_reads,
+            params.kraken2_db ? file(params.kraken2_db) : []
+        )
+
+        ch_kraken_results  = KRAKEN_SAMPLE.out.kraken_results
+        ch_kraken_versions = KRAKEN_SAMPLE.out.versions
+    }
+    ch_versions = ch_versions.mix(ch_kraken_versions.first())
 
     //
     // MODULE: KRAKEN_SUMMARY
     //
     KRAKEN_SUMMARY (
-        KRAKEN_SAMPLE.out.kraken_results.collect()
+        ch_kraken_results.collect()
     )
 
     if (params.ntc_regex != null) {
@@ -274,7 +507,8 @@ workflow SPNTYPEID {
         // MODULE: KRAKEN_NTC
         // 
         KRAKEN_NTC (
-            ch_input_reads.ntc
+            ch_input_reads.ntc,
+            params.kraken2_db ? file(params.kraken2_db) : []
         )
     }
 
@@ -282,7 +516,7 @@ workflow SPNTYPEID {
     // MODULE: SEROBA
     //
     SEROBA (
-        ch_input_reads.sample
+        ch_seroba_reads
     )
     ch_versions = ch_versions.mix(SEROBA.out.versions.first())
 
@@ -297,7 +531,7 @@ workflow SPNTYPEID {
     // MODULE: PERCENT_STREP_SUMMARY
     //
     PERCENT_STREP_SUMMARY (
-        KRAKEN_SAMPLE.out.kraken_results.collect(),
+        KRAKEN_SUMMARY.out.kraken_store,
         params.minpctstrep,
         params.minpctspn,
         params.maxpctother
@@ -341,9 +575,12 @@ workflow SPNTYPEID {
     ch_compiled_results = ch_compiled_results.mix(QUALITY_STATS.out.quality_tsv)
     ch_compiled_results = ch_compiled_results.mix(COVERAGE_STATS.out.coverage_tsv)
     ch_compiled_results = ch_compiled_results.mix(QUAST_SUMMARY.out.quast_tsv)
-    ch_compiled_results = ch_compiled_results.mix(KRAKEN_SAMPLE.out.versions.first())
+    ch_compiled_results = ch_compiled_results.mix(ch_kraken_versions.first())
     ch_compiled_results = ch_compiled_results.mix(PERCENT_STREP_SUMMARY.out.percent_strep_tsv)
     ch_compiled_results = ch_compiled_results.mix(SEROBA_SUMMARY.out.seroba_tsv)
+    ch_compiled_results = ch_compiled_results.mix(ch_sketch_flags)
+    ch_compiled_results = ch_compiled_results.mix(ch_gate_results)
+    ch_compiled_results = ch_compiled_results.mix(ch_prior_rows)
 
     if (params.ntc_regex != null) {
         REPORT_WITH_NTC (
@@ -392,8 +629,8 @@ workflow SPNTYPEID {
     ch_multiqc_files = ch_multiqc_files.mix(FASTQC.out.zip.collect{it[1]}.ifEmpty([]))
     ch_multiqc_files = ch_multiqc_files.mix(BBDUK.out.bbduk_adapters.collect().ifEmpty([]))
     ch_multiqc_files = ch_multiqc_files.mix(BBDUK.out.bbduk_trim.collect().ifEmpty([]))
-    ch_multiqc_files = ch_multiqc_files.mix(SAMTOOLS.out.stats_multiqc.collect().ifEmpty([]))
-    ch_multiqc_files = ch_multiqc_files.mix(KRAKEN_SAMPLE.out.kraken_results.collect().ifEmpty([]))
+    ch_multiqc_files = ch_multiqc_files.mix(ch_samtools_stats.collect().ifEmpty([]))
+    ch_multiqc_files = ch_multiqc_files.mix(ch_kraken_results.collect().ifEmpty([]))
 
     if (params.ntc_regex != null) {
         ch_multiqc_files = ch_multiqc_files.mix(KRAKEN_NTC.out.kraken_results.collect().ifEmpty([]))